@@ -0,0 +1,63 @@
+import math
+import os
+import time
+
+import torch
+
+from src.lib.config.dir import Dir
+from src.modules.data_pipeline.sinusoidal_positional_encoder import (
+    BidirectionalSinusoidalPositionalEncoder,
+    ReversedSinusoidalPositionalEncoder,
+    SinusoidalPositionalEncoder,
+)
+from src.modules.protein.protein_list import ProteinList
+
+# cold-cache cost of building the sinusoidal positional tables for every protein of a DeepLC dataset
+deeplc_dataset_names = ["plasma_lumos_1h"]
+a, b, gamma = 1000, 1, 0
+
+
+def legacy_positional_tensor(length: int) -> torch.Tensor:
+    # the former per-position, per-dimension implementation, kept here as the reference
+    positional_vectors = []
+    for p in range(1, length + 1):
+        positional_factors: list[float] = []
+        for i in range(1, 1280 + 1):
+            if i // 2 == 0:
+                positional_factors.append((math.sin(p / (a ** ((i - 1) / 1280)))) ** b + gamma)
+            else:
+                positional_factors.append((math.sin(p / (a ** ((i - 2) / 1280)))) ** b + gamma)
+        positional_vectors.append(positional_factors)
+
+    return torch.Tensor(positional_vectors)
+
+
+for dataset_name in deeplc_dataset_names:
+    dataset_csv_path = os.path.join(Dir.root_dir, "data", dataset_name, "data.csv")
+    protein_list = ProteinList.from_csv(path=dataset_csv_path)
+    lengths = [protein.length for protein in protein_list.proteins]
+    print(f"{dataset_name}: {len(lengths)} proteins, {len(set(lengths))} distinct lengths")
+
+    start = time.perf_counter()
+    legacy_cache: dict[int, torch.Tensor] = {}
+    for length in lengths:
+        if length not in legacy_cache:
+            legacy_cache[length] = legacy_positional_tensor(length=length)
+    legacy_duration = time.perf_counter() - start
+    print(f"legacy loop: {legacy_duration:.3f}s")
+
+    for encoder_class in [
+        SinusoidalPositionalEncoder,
+        ReversedSinusoidalPositionalEncoder,
+        BidirectionalSinusoidalPositionalEncoder,
+    ]:
+        encoder = encoder_class(a=a, b=b, gamma=gamma)
+        start = time.perf_counter()
+        for length in lengths:
+            encoder._positional_tensor(length=length)
+        duration = time.perf_counter() - start
+        print(f"{encoder_class.__name__}: {duration:.3f}s ({legacy_duration / duration:.1f}x)")
+
+    encoder = SinusoidalPositionalEncoder(a=a, b=b, gamma=gamma)
+    for length, tensor in legacy_cache.items():
+        assert torch.equal(tensor, encoder._positional_tensor(length=length))
@@ -0,0 +1,20 @@
+import os
+import time
+
+from src.lib.config.dir import Dir
+from src.modules.protein.protein_list import ProteinList
+
+# keys/s of the per-protein HDF5 layout for the serial loader and the worker pool
+dataset_name = "plasma_lumos_1h"
+extracted_path = os.path.join(Dir.result_dir, "EXT0001", dataset_name, "data.h5")
+
+start = time.perf_counter()
+protein_list = ProteinList.from_hdf5(extracted_path)
+duration = time.perf_counter() - start
+print(f"serial: {len(protein_list) / duration:.0f} keys/s")
+
+for workers in [1, 2, 4, 8]:
+    start = time.perf_counter()
+    protein_list = ProteinList.from_hdf5_parallel(extracted_path, workers=workers)
+    duration = time.perf_counter() - start
+    print(f"{workers} workers: {len(protein_list) / duration:.0f} keys/s")
@@ -0,0 +1,36 @@
+import os
+import resource
+from concurrent.futures import ProcessPoolExecutor
+
+from src.lib.config.dir import Dir
+from src.modules.extract.language.esm.esm_converter import ESMConverter
+from src.modules.protein.protein_list import ProteinList
+
+# peak memory of one ESM2 forward pass with and without the contact head
+dataset_name = "plasma_lumos_1h"
+batch_sizes = [32, 64, 128]
+
+
+def convert(seqs: list[str], return_contacts: bool) -> int:
+    converter = ESMConverter("esm2", return_contacts=return_contacts)
+    loaded = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    converter(seqs=seqs)
+    # ru_maxrss is in KiB on Linux; the model weights are excluded by subtracting the peak after loading
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - loaded
+
+
+dataset_csv_path = os.path.join(Dir.root_dir, "data", dataset_name, "data.csv")
+protein_list = ProteinList.from_csv(path=dataset_csv_path)
+
+for batch_size in batch_sizes:
+    seqs = [protein.seq for protein in protein_list.proteins[:batch_size]]
+    peaks: dict[bool, int] = {}
+    for return_contacts in [False, True]:
+        # a fresh process per measurement, so that one peak does not hide the other
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            peaks[return_contacts] = executor.submit(convert, seqs, return_contacts).result()
+
+    print(
+        f"batch {batch_size}: contacts {peaks[True] / 1024:.0f}MiB, "
+        f"representations only {peaks[False] / 1024:.0f}MiB, saved {(peaks[True] - peaks[False]) / 1024:.0f}MiB"
+    )
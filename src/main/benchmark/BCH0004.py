@@ -0,0 +1,27 @@
+import os
+import time
+
+from src.lib.config.dir import Dir
+from src.modules.extract.extractor.sharded_extractor import ShardedExtractor
+from src.modules.extract.language.esm.esm2 import ESM2Language
+from src.modules.protein.protein_list import ProteinList
+
+# ESM2 extraction throughput for several process x thread layouts over the same number of cores
+dataset_name = "plasma_lumos_1h"
+sample_size = 2048
+cores = os.cpu_count() or 1
+layouts = [(processes, cores // processes) for processes in [1, 2, 4, 8, 16] if processes <= cores]
+
+language = ESM2Language()
+
+dataset_csv_path = os.path.join(Dir.root_dir, "data", dataset_name, "data.csv")
+protein_list = ProteinList.from_csv(path=dataset_csv_path)
+protein_list = ProteinList(proteins=protein_list.proteins[:sample_size])
+tokens = sum(protein.length for protein in protein_list.proteins)
+
+for processes, threads in layouts:
+    extractor = ShardedExtractor(language=language, processes=processes, threads=threads)
+    start = time.perf_counter()
+    extractor(protein_list=protein_list, batch_size=32)
+    duration = time.perf_counter() - start
+    print(f"{processes} processes x {threads} threads: {tokens / duration:.0f} tokens/s")
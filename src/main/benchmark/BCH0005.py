@@ -0,0 +1,93 @@
+import os
+import random
+import time
+
+import torch
+
+from src.lib.config.dir import Dir
+from src.modules.data_pipeline.aggregator import Aggregator
+from src.modules.data_pipeline.data_pipeline import DataPipeline
+from src.modules.data_pipeline.initializer import Initializer
+from src.modules.dataloader.dataloader import Dataloader, DataloaderState
+from src.modules.extract.extractor.extractor import Extractor
+from src.modules.extract.language.esm._esm import _ESMLanguage
+from src.modules.extract.language.esm.esm1b import ESM1bLanguage
+from src.modules.extract.language.esm.esm2 import ESM2Language
+from src.modules.extract.language.esm.esm_converter import ESMModelName, ESMPrecision
+from src.modules.model.architecture import Architecture
+from src.modules.model.configurable_model import ConfigurableModel
+from src.modules.protein.protein_list import ProteinList
+from src.modules.train.trainer import Trainer
+
+# validates reduced precision ESM2 and ESM1b inference against float32:
+# representation cosine similarity, extraction throughput and the resulting RT pearson on one dataset
+dataset_name = "plasma_lumos_1h"
+languages: dict[ESMModelName, type[_ESMLanguage]] = {"esm2": ESM2Language, "esm1b": ESM1bLanguage}
+precisions: list[ESMPrecision] = ["float32", "int8", "bfloat16"]
+seed = 0
+
+
+def load_protein_list() -> ProteinList:
+    # seeded, so that every precision is trained and evaluated on the same split
+    random.seed(seed)
+    dataset_csv_path = os.path.join(Dir.root_dir, "data", dataset_name, "data.csv")
+    return ProteinList.from_csv(path=dataset_csv_path)
+
+
+def train(protein_list: ProteinList) -> float:
+    random.seed(seed)
+    torch.manual_seed(seed)
+    pipeline = DataPipeline(pipes=[Initializer(), Aggregator("mean")])
+    dataloader_state = DataloaderState(
+        {
+            "protein_list": protein_list,
+            "batch_size": 128,
+            "input_props": ["length"],
+            "output_props": ["rt"],
+            "pipeline": pipeline,
+            "cacheable": True,
+        }
+    )
+    dataloader = Dataloader(state=dataloader_state).precompute()
+    architecture = Architecture(source=(64, 5), input_size=1280 + 1, output_size=1)
+    model = ConfigurableModel(architecture=architecture)
+    trainer = Trainer(model=model, dataloader=dataloader)
+    trainer.train()
+
+    return trainer.recorder.max_accuracy_result["evaluate"]["rt"]["criteria"]["pearsonr"]
+
+
+representations: dict[tuple[ESMModelName, ESMPrecision], dict[str, torch.Tensor]] = {}
+durations: dict[tuple[ESMModelName, ESMPrecision], float] = {}
+pearsonrs: dict[tuple[ESMModelName, ESMPrecision], float] = {}
+
+for model_name, language in languages.items():
+    for precision in precisions:
+        extractor = Extractor(language=language(precision=precision))
+        protein_list = load_protein_list()
+
+        start = time.perf_counter()
+        extractor(protein_list=protein_list, batch_size=32)
+        durations[(model_name, precision)] = time.perf_counter() - start
+        representations[(model_name, precision)] = {
+            protein.key: protein.representations for protein in protein_list.proteins
+        }
+
+        pearsonrs[(model_name, precision)] = train(protein_list=protein_list)
+
+for model_name in languages:
+    baseline = (model_name, "float32")
+    for precision in precisions:
+        similarities = torch.cat(
+            [
+                torch.nn.functional.cosine_similarity(representations[baseline][key], representation, dim=1)
+                for key, representation in representations[(model_name, precision)].items()
+            ]
+        )
+        pearsonr = pearsonrs[(model_name, precision)]
+        print(
+            f"{model_name} {precision}: "
+            f"cosine mean {similarities.mean().item():.5f} min {similarities.min().item():.5f}, "
+            f"speedup {durations[baseline] / durations[(model_name, precision)]:.2f}x, "
+            f"RT pearson {pearsonr:.4f} ({pearsonr - pearsonrs[baseline]:+.4f})"
+        )
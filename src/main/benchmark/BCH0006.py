@@ -0,0 +1,43 @@
+import multiprocessing
+import shutil
+import time
+
+from src.modules.extract.language.quick_esm import _quick_esm
+from src.modules.extract.language.quick_esm.quick_esm2 import QuickESM2Language
+
+# QuickESM startup: legacy per-instance HDF5 load versus the shared memory-mapped source table
+repeats = 32
+workers = 4
+
+
+def construct(_):
+    start = time.perf_counter()
+    QuickESM2Language()
+    return time.perf_counter() - start
+
+
+language = QuickESM2Language()
+
+start = time.perf_counter()
+for _ in range(repeats):
+    language._load_source()
+legacy = (time.perf_counter() - start) / repeats
+
+shutil.rmtree(language._get_sidecar_dir("amino_acid"), ignore_errors=True)
+_quick_esm._source_tables.clear()
+cold = construct(None)
+
+start = time.perf_counter()
+for _ in range(repeats):
+    construct(None)
+warm = (time.perf_counter() - start) / repeats
+
+# forked processes start with an empty cache and map the existing sidecar instead of parsing the HDF5 source
+_quick_esm._source_tables.clear()
+with multiprocessing.get_context("fork").Pool(workers) as pool:
+    spawned = sum(pool.map(construct, range(workers))) / workers
+
+print(f"legacy hdf5 load: {legacy * 1000:.2f} ms/instance")
+print(f"cold (sidecar written): {cold * 1000:.2f} ms")
+print(f"warm (process cache): {warm * 1000:.4f} ms/instance")
+print(f"forked process (mapped sidecar): {spawned * 1000:.2f} ms/instance")
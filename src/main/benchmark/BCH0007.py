@@ -0,0 +1,86 @@
+import os
+import random
+import time
+
+import torch
+
+from src.lib.config.dir import Dir
+from src.modules.data_pipeline.aggregator import Aggregator
+from src.modules.data_pipeline.data_pipeline import DataPipeline
+from src.modules.data_pipeline.initializer import Initializer
+from src.modules.dataloader.dataloader import Dataloader, DataloaderState
+from src.modules.extract.extractor.extractor import Extractor
+from src.modules.extract.language._language import _Language
+from src.modules.extract.language.esm.esm2 import ESM2Language
+from src.modules.extract.language.quick_esm.quick_esm2 import QuickESM2Language
+from src.modules.model.architecture import Architecture
+from src.modules.model.configurable_model import ConfigurableModel
+from src.modules.protein.protein_list import ProteinList
+from src.modules.train.trainer import Trainer
+
+# QuickESM single residue and k-mer context lookups against full ESM2:
+# representation cosine similarity to ESM2, extraction throughput and the resulting RT pearson on one dataset
+dataset_name = "plasma_lumos_1h"
+seed = 0
+
+
+def load_protein_list() -> ProteinList:
+    # seeded, so that every language is trained and evaluated on the same split
+    random.seed(seed)
+    dataset_csv_path = os.path.join(Dir.root_dir, "data", dataset_name, "data.csv")
+    return ProteinList.from_csv(path=dataset_csv_path)
+
+
+def train(protein_list: ProteinList) -> float:
+    random.seed(seed)
+    torch.manual_seed(seed)
+    pipeline = DataPipeline(pipes=[Initializer(), Aggregator("mean")])
+    dataloader_state = DataloaderState(
+        {
+            "protein_list": protein_list,
+            "batch_size": 128,
+            "input_props": ["length"],
+            "output_props": ["rt"],
+            "pipeline": pipeline,
+            "cacheable": True,
+        }
+    )
+    dataloader = Dataloader(state=dataloader_state).precompute()
+    architecture = Architecture(source=(64, 5), input_size=1280 + 1, output_size=1)
+    model = ConfigurableModel(architecture=architecture)
+    trainer = Trainer(model=model, dataloader=dataloader)
+    trainer.train()
+
+    return trainer.recorder.max_accuracy_result["evaluate"]["rt"]["criteria"]["pearsonr"]
+
+
+languages: list[_Language] = [ESM2Language(), QuickESM2Language(), QuickESM2Language(context="kmer")]
+representations: dict[str, dict[str, torch.Tensor]] = {}
+durations: dict[str, float] = {}
+pearsonrs: dict[str, float] = {}
+
+for language in languages:
+    extractor = Extractor(language=language)
+    protein_list = load_protein_list()
+
+    start = time.perf_counter()
+    extractor(protein_list=protein_list, batch_size=32)
+    durations[language.name] = time.perf_counter() - start
+    representations[language.name] = {protein.key: protein.representations for protein in protein_list.proteins}
+
+    pearsonrs[language.name] = train(protein_list=protein_list)
+
+reference = languages[0].name
+for language in languages:
+    similarities = torch.cat(
+        [
+            torch.nn.functional.cosine_similarity(representations[reference][key], representation, dim=1)
+            for key, representation in representations[language.name].items()
+        ]
+    )
+    print(
+        f"{language.name}: "
+        f"cosine to {reference} mean {similarities.mean().item():.5f} min {similarities.min().item():.5f}, "
+        f"speedup {durations[reference] / durations[language.name]:.2f}x, "
+        f"RT pearson {pearsonrs[language.name]:.4f} ({pearsonrs[language.name] - pearsonrs[reference]:+.4f})"
+    )
@@ -0,0 +1,57 @@
+import ast
+import glob
+import os
+import subprocess
+import sys
+
+from src.lib.config.dir import Dir
+
+# import time of every entry point's module imports, measured with -X importtime in a fresh interpreter each
+entry_point_dirs = ["extract", "train", "visualize"]
+top_modules = 3
+
+
+def collect_imports(path: str) -> list[str]:
+    with open(path) as f:
+        tree = ast.parse(f.read())
+
+    statements: list[str] = []
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            statements.append(ast.unparse(node))
+    return statements
+
+
+def measure(statements: list[str]) -> tuple[float, list[tuple[str, int]], str]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "\n".join(statements)],
+        cwd=Dir.root_dir,
+        capture_output=True,
+        text=True,
+    )
+
+    # stderr lines are "import time: self [us] | cumulative | imported package", nested packages are indented
+    cumulatives: dict[str, int] = {}
+    errors: list[str] = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            errors.append(line)
+            continue
+        fields = line.removeprefix("import time:").split("|")
+        if not fields[1].strip().isdigit():
+            continue
+        name = fields[2].strip()
+        cumulatives[name] = max(cumulatives.get(name, 0), int(fields[1]))
+
+    total = sum(cumulative for name, cumulative in cumulatives.items() if "." not in name) / 1e6
+    packages = {name: cumulative for name, cumulative in cumulatives.items() if "." not in name and name != "src"}
+    heaviest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top_modules]
+    return total, heaviest, errors[-1] if result.returncode != 0 and errors else ""
+
+
+for entry_point_dir in entry_point_dirs:
+    for path in sorted(glob.glob(os.path.join(Dir.root_dir, "src", "main", entry_point_dir, "*.py"))):
+        total, heaviest, error = measure(collect_imports(path))
+        name = os.path.relpath(path, Dir.root_dir)
+        summary = ", ".join(f"{package} {cumulative / 1e3:.0f} ms" for package, cumulative in heaviest)
+        print(f"{name}: {total * 1e3:.0f} ms ({summary}){f' [failed: {error}]' if error else ''}")
@@ -0,0 +1,35 @@
+import os
+import time
+import tracemalloc
+
+import torch
+
+from src.lib.config.dir import Dir
+from src.modules.protein.protein_list import ProteinList
+
+# memory per protein and DataBatch-style batch assembly time for a proteometools-scale columnar ProteinList
+dataset_name = "plasma_lumos_1h"
+copies = 40
+batch_size = 128
+input_props = ["length"]
+output_props = ["rt"]
+
+dataset_csv_path = os.path.join(Dir.root_dir, "data", dataset_name, "data.csv")
+
+tracemalloc.start()
+protein_list = ProteinList.join([ProteinList.from_csv(path=dataset_csv_path) for _ in range(copies)])
+current, _ = tracemalloc.get_traced_memory()
+tracemalloc.stop()
+print(f"{len(protein_list)} proteins: {current / len(protein_list):.0f} bytes/protein")
+
+for protein in protein_list.proteins:
+    protein.set_piped(torch.zeros(16))
+batches = protein_list.even_split(unit_size=batch_size)
+
+start = time.perf_counter()
+for batch in batches:
+    piped = torch.stack([protein.piped for protein in batch.proteins])
+    inputs = torch.cat([piped, torch.from_numpy(batch.read_props(input_props)).to(torch.float32)], dim=1)
+    outputs = torch.from_numpy(batch.read_props(output_props)).to(torch.float32)
+duration = time.perf_counter() - start
+print(f"batch assembly: {duration / len(batches) * 1e3:.3f} ms/batch of {batch_size}")
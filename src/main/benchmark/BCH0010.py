@@ -0,0 +1,52 @@
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import polars as pl
+
+from src.lib.config.dir import Dir
+from src.modules.protein.protein_list import ProteinList
+
+# CSV ingestion of a proteometools-scale file: whole-file from_csv against chunked scan_csv;
+# each mode runs in a fresh interpreter (forking after polars has started its threads can deadlock),
+# so that its peak memory is its own
+dataset_name = "plasma_lumos_1h"
+copies = 200
+chunk_size = 65536
+
+dataset_csv_path = os.path.join(Dir.root_dir, "data", dataset_name, "data.csv")
+large_csv_path = os.path.join(Dir.cache_dir, "BCH0010", "data.csv")
+
+
+def peak_megabytes():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def load():
+    baseline = peak_megabytes()
+    start = time.perf_counter()
+    protein_list = ProteinList.from_csv(path=large_csv_path)
+    duration = time.perf_counter() - start
+    print(f"from_csv: {len(protein_list)} rows in {duration:.2f} s, +{peak_megabytes() - baseline:.0f} MB peak")
+
+
+def scan():
+    baseline = peak_megabytes()
+    start = time.perf_counter()
+    rows = sum(len(protein_list) for protein_list in ProteinList.scan_csv(path=large_csv_path, chunk_size=chunk_size))
+    duration = time.perf_counter() - start
+    print(f"scan_csv: {rows} rows in {duration:.2f} s, +{peak_megabytes() - baseline:.0f} MB peak")
+
+
+if len(sys.argv) > 1:
+    {"load": load, "scan": scan}[sys.argv[1]]()
+else:
+    os.makedirs(os.path.dirname(large_csv_path), exist_ok=True)
+    df = pl.read_csv(dataset_csv_path)
+    df = pl.concat([df] * copies).with_columns(pl.int_range(0, len(df) * copies).alias("index"))
+    df.write_csv(large_csv_path)
+
+    for mode in ["load", "scan"]:
+        subprocess.run([sys.executable, "-m", "src.main.benchmark.BCH0010", mode], cwd=Dir.root_dir, check=True)
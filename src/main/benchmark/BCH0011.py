@@ -0,0 +1,45 @@
+import os
+import time
+
+import torch
+
+from src.lib.config.dir import Dir
+from src.modules.data_pipeline.aggregator import Aggregator
+from src.modules.data_pipeline.data_pipeline import DataPipeline
+from src.modules.data_pipeline.initializer import Initializer
+from src.modules.dataloader.dataloader import Dataloader, DataloaderState
+from src.modules.protein.protein_list import ProteinList
+
+# one epoch of batch assembly on a proteometools-scale dataset, with a varying number of metadata reads
+# (len of the batch and the dataloader) per batch; with index batches the cost should not depend on them
+dataset_name = "plasma_lumos_1h"
+copies = 40
+batch_size = 128
+reads = [0, 4, 16]
+
+dataset_csv_path = os.path.join(Dir.root_dir, "data", dataset_name, "data.csv")
+protein_list = ProteinList.join([ProteinList.from_csv(path=dataset_csv_path) for _ in range(copies)])
+for protein in protein_list.proteins:
+    protein.set_representations(torch.zeros(protein.length, 16))
+
+dataloader_state = DataloaderState(
+    {
+        "protein_list": protein_list,
+        "batch_size": batch_size,
+        "input_props": ["length"],
+        "output_props": ["rt"],
+        "pipeline": DataPipeline(pipes=[Initializer(), Aggregator("mean")]),
+        "cacheable": False,
+    }
+)
+dataloader = Dataloader(state=dataloader_state).precompute(release=False)
+
+for epoch, count in enumerate(reads):
+    start = time.perf_counter()
+    for batch in dataloader.set_epoch(epoch).batches:
+        for _ in range(count):
+            len(batch)
+            len(dataloader)
+        batch.use()
+    duration = time.perf_counter() - start
+    print(f"{count} reads per batch: {len(protein_list)} proteins in {duration:.3f} s")
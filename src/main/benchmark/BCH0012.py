@@ -0,0 +1,55 @@
+import os
+import time
+
+import numpy as np
+import torch
+from torch.profiler import ProfilerActivity, profile
+
+from src.lib.config.dir import Dir
+from src.modules.dataloader.collator import BatchCollator
+from src.modules.dataloader.sampler import EpochSampler
+from src.modules.protein.protein_list import ProteinList
+
+# one epoch of batch collation on a proteometools-scale dataset: stacking and concatenating fresh tensors per batch
+# against writing into the collator's reused buffers; bytes allocated per epoch are summed by the torch profiler
+dataset_name = "plasma_lumos_1h"
+copies = 40
+batch_size = 128
+dim = 1280
+input_props = ["length"]
+output_props = ["rt"]
+
+dataset_csv_path = os.path.join(Dir.root_dir, "data", dataset_name, "data.csv")
+protein_list = ProteinList.join([ProteinList.from_csv(path=dataset_csv_path) for _ in range(copies)])
+piped = [torch.zeros(dim) for _ in range(len(protein_list))]
+batches = EpochSampler(size=len(protein_list), batch_size=batch_size).batches(epoch=0)
+
+
+def concatenate(indices: np.ndarray):
+    batch = protein_list.take(positions=indices)
+    stacked = torch.stack([piped[i] for i in indices.tolist()])
+    props = torch.from_numpy(batch.read_props(input_props))
+    inputs = torch.cat([stacked.to(torch.float32), props.to(torch.float32)], dim=1)
+    outputs = torch.from_numpy(batch.read_props(output_props)).to(torch.float32)
+    return inputs, outputs
+
+
+def collate(indices: np.ndarray):
+    return collator.collate(indices=indices, piped=[piped[i] for i in indices.tolist()])
+
+
+collator = BatchCollator(
+    protein_list=protein_list, input_props=input_props, output_props=output_props, batch_size=batch_size
+)
+for name, assemble in [("concatenate", concatenate), ("collate", collate)]:
+    start = time.perf_counter()
+    for indices in batches:
+        assemble(indices)
+    duration = time.perf_counter() - start
+
+    # a second epoch under the profiler, which slows it down too much to be timed
+    with profile(activities=[ProfilerActivity.CPU], profile_memory=True) as profiler:
+        for indices in batches:
+            assemble(indices)
+    allocated = sum(event.self_cpu_memory_usage for event in profiler.events() if event.self_cpu_memory_usage > 0)
+    print(f"{name}: {duration / len(batches) * 1e3:.3f} ms/batch, {allocated / 2**20:.0f} MB allocated per epoch")
@@ -0,0 +1,66 @@
+import os
+import time
+from typing import Optional
+
+import numpy as np
+import torch
+
+from src.lib.config.dir import Dir
+from src.modules.data_pipeline.aggregator import Aggregator
+from src.modules.data_pipeline.data_pipeline import DataPipeline
+from src.modules.data_pipeline.initializer import Initializer
+from src.modules.data_pipeline.sinusoidal_positional_encoder import SinusoidalPositionalEncoder
+from src.modules.dataloader.dataloader import Dataloader, DataloaderPrefetch, DataloaderState
+from src.modules.model.architecture import Architecture
+from src.modules.model.configurable_model import ConfigurableModel
+from src.modules.protein.protein_list import ProteinList
+from src.modules.train.criterion import Criterion
+
+# one training epoch with the positional encoding pipeline run per batch, synchronously against prefetching
+# thread and process workers; the gain is bounded by the cores left over for the workers
+dataset_name = "plasma_lumos_1h"
+sample_size = 4000
+dim = 1280
+prefetches: list[Optional[DataloaderPrefetch]] = [
+    None,
+    {"depth": 2, "workers": 2, "mode": "thread"},
+    {"depth": 4, "workers": 2, "mode": "process"},
+]
+
+dataset_csv_path = os.path.join(Dir.root_dir, "data", dataset_name, "data.csv")
+protein_list = ProteinList.from_csv(path=dataset_csv_path).take(positions=np.arange(sample_size))
+for protein in protein_list.proteins:
+    protein.set_representations(torch.randn(protein.length, dim))
+
+criterion = Criterion()
+for prefetch in prefetches:
+    torch.manual_seed(0)
+    pipeline = DataPipeline(
+        pipes=[Initializer(), SinusoidalPositionalEncoder(a=1000, b=1, gamma=0), Aggregator("mean")]
+    )
+    dataloader_state = DataloaderState(
+        {
+            "protein_list": protein_list,
+            "batch_size": 128,
+            "input_props": ["length"],
+            "output_props": ["rt"],
+            "pipeline": pipeline,
+            "cacheable": False,
+            "prefetch": prefetch,
+        }
+    )
+    dataloader = Dataloader(state=dataloader_state)
+    model = ConfigurableModel(architecture=Architecture(source=(64, 5), input_size=dim + 1, output_size=1))
+    model.train()
+    model.optimizer.train()
+
+    start = time.perf_counter()
+    for input, label, _ in dataloader.use():
+        model.optimizer.zero_grad()
+        loss = criterion.mean_squared_error(model(input=input), label)
+        loss.backward()
+        model.optimizer.step()
+    duration = time.perf_counter() - start
+
+    name = "sync" if prefetch is None else f"{prefetch.get('mode', 'thread')} x{prefetch['workers']}"
+    print(f"{name}: {duration:.2f} s/epoch on {os.cpu_count()} cores")
@@ -0,0 +1,58 @@
+import tracemalloc
+
+import numpy as np
+
+from src.modules.train.train_recorder import TrainRecorder
+from src.modules.train.types import Criteria, EpochPrediction
+
+# memory held by the train recorder over a long run on a proteometools-scale dataset, against keeping every epoch's
+# outputs and labels as python float lists; predictions are random, only their size matters
+samples = 100000
+epochs = 50
+output_stride = 10
+ratios = {"train": 0.8, "validate": 0.1, "evaluate": 0.1}
+
+rng = np.random.default_rng(0)
+
+
+def predict(key: str, epoch: int) -> EpochPrediction:
+    size = int(samples * ratios[key])
+    criteria: Criteria = {
+        "root_mean_squared_error": 1.0,
+        "mean_squared_error": 1.0,
+        "mean_absolute_error": 1.0,
+        # rising, so that the max accuracy epoch keeps moving like in a converging run
+        "pearsonr": epoch / epochs,
+    }
+    return {
+        "output": rng.random((size, 1), dtype=np.float32),
+        "label": rng.random((size, 1), dtype=np.float32),
+        "criteria": [criteria],
+    }
+
+
+tracemalloc.start()
+lists: list[list[float]] = []
+for epoch in range(1, epochs + 1):
+    for key in ratios:
+        prediction = predict(key=key, epoch=epoch)
+        lists.append(prediction["output"][:, 0].tolist())
+        lists.append(prediction["label"][:, 0].tolist())
+list_bytes, _ = tracemalloc.get_traced_memory()
+del lists
+tracemalloc.stop()
+
+tracemalloc.start()
+recorder = TrainRecorder(prop_names=["rt"], output_stride=output_stride)
+for epoch in range(1, epochs + 1):
+    recorder.append_results(
+        train_epoch_prediction=predict(key="train", epoch=epoch),
+        validate_epoch_prediction=predict(key="validate", epoch=epoch),
+        evaluate_epoch_prediction=predict(key="evaluate", epoch=epoch),
+    )
+    recorder.next_epoch()
+recorder_bytes, _ = tracemalloc.get_traced_memory()
+tracemalloc.stop()
+
+print(f"float lists: {list_bytes / 2**20:.0f} MB after {epochs} epochs of {samples} samples")
+print(f"recorder (stride {output_stride}): {recorder_bytes / 2**20:.0f} MB")
@@ -0,0 +1,80 @@
+import os
+import time
+
+import numpy as np
+
+from src.lib.config.dir import Dir
+from src.modules.train.train_recorder import TrainRecorder
+from src.modules.train.train_result import TrainResultLoader
+from src.modules.train.train_result_stream import TrainResultStreamWriter
+from src.modules.train.types import EpochPrediction, TrainRecorderResultKey, TrainResult
+
+# writing a long run's results: one group per epoch per split per prop after training, against appending every epoch
+# to chunked datasets while training; predictions are random, only their size matters
+samples = 20000
+epochs = 500
+output_stride = 50
+ratios: dict[TrainRecorderResultKey, float] = {"train": 0.8, "validate": 0.1, "evaluate": 0.1}
+
+save_dir = os.path.join(Dir.cache_dir, "BCH0015")
+os.makedirs(save_dir, exist_ok=True)
+rng = np.random.default_rng(0)
+
+
+def predict(key: TrainRecorderResultKey, epoch: int) -> EpochPrediction:
+    size = int(samples * ratios[key])
+    return {
+        "output": rng.random((size, 1), dtype=np.float32),
+        "label": rng.random((size, 1), dtype=np.float32),
+        "criteria": [
+            {"root_mean_squared_error": 1.0, "mean_squared_error": 1.0, "mean_absolute_error": 1.0, "pearsonr": epoch}
+        ],
+    }
+
+
+predictions = [{key: predict(key=key, epoch=epoch) for key in ratios} for epoch in range(1, epochs + 1)]
+
+recorder = TrainRecorder(prop_names=["rt"], output_stride=output_stride)
+stream_path = os.path.join(save_dir, "streamed.h5")
+writer = TrainResultStreamWriter(
+    path=stream_path, input_props=["length"], output_props=["rt"], output_stride=output_stride
+)
+stream_duration = 0.0
+for epoch, prediction in enumerate(predictions, start=1):
+    recorder.append_results(
+        train_epoch_prediction=prediction["train"],
+        validate_epoch_prediction=prediction["validate"],
+        evaluate_epoch_prediction=prediction["evaluate"],
+    )
+    start = time.perf_counter()
+    writer.append(epoch=epoch, predictions=prediction, max_accuracy_epoch=recorder.max_accuracy_epoch)
+    stream_duration += time.perf_counter() - start
+    recorder.next_epoch()
+start = time.perf_counter()
+writer.close()
+stream_duration += time.perf_counter() - start
+
+train_result: TrainResult = {
+    "input_props": ["length"],
+    "output_props": ["rt"],
+    "max_accuracy_epoch": recorder.max_accuracy_epoch,
+    "max_accuracy_result": recorder.max_accuracy_result,
+    "train_result": {
+        "train": recorder.train_result,
+        "validate": recorder.validate_result,
+        "evaluate": recorder.evaluate_result,
+    },
+}
+groups_path = os.path.join(save_dir, "groups.h5")
+start = time.perf_counter()
+TrainResultLoader(train_result).save_as_h5(groups_path)
+groups_duration = time.perf_counter() - start
+
+for name, path, duration in [("groups", groups_path, groups_duration), ("streamed", stream_path, stream_duration)]:
+    start = time.perf_counter()
+    TrainResultLoader.from_h5(path)
+    load_duration = time.perf_counter() - start
+    print(
+        f"{name}: write {duration:.2f} s, {os.path.getsize(path) / 2**20:.1f} MB, load {load_duration:.2f} s "
+        f"for {epochs} epochs"
+    )
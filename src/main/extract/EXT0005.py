@@ -0,0 +1,21 @@
+import os
+
+from src.lib.config.dir import Dir
+from src.modules.extract.extractor.extractor import Extractor
+from src.modules.extract.language.esm.esm2 import ESM2Language
+from src.modules.protein.protein_list import ProteinList
+
+# designate the language you want to use for extraction
+language = ESM2Language()
+# set the language to extractor
+extractor = Extractor(language=language)
+
+# a csv too large to load at once is read chunk by chunk
+dataset_csv_path = os.path.join(Dir.root_dir, "data", "proteometools", "data.csv")
+protein_lists = ProteinList.scan_csv(path=dataset_csv_path, chunk_size=65536)
+
+# each chunk is extracted and streamed into `data.h5`; an interrupted run resumes where it stopped
+experiment_dir = os.path.join(Dir.root_dir, "result", "EXT0005", "proteometools")
+os.makedirs(experiment_dir, exist_ok=True)
+extracted_path = os.path.join(experiment_dir, "data.h5")
+extractor.stream(protein_lists=protein_lists, batch_size=32, stream_path=extracted_path)
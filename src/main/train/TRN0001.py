@@ -11,7 +11,6 @@ from src.modules.dataloader.dataloader import Dataloader, DataloaderState
 from src.modules.model.architecture import Architecture
 from src.modules.model.configurable_model import ConfigurableModel
 from src.modules.protein.protein_list import ProteinList
-from src.modules.train.train_result import TrainResultLoader
 from src.modules.train.trainer import Trainer
 
 protein_list = ProteinList.from_hdf5("result/EXT0001/plasma_lumos_1h/data.h5")
@@ -31,17 +30,16 @@ dataloader_state = DataloaderState(
     }
 )
 dataloader = Dataloader(state=dataloader_state)
+# the pipeline output is a fixed-size vector, so it is computed once and the representations are released
+dataloader.precompute()
 
 
 for i in range(1):
     architecture = Architecture(source=(64, 5), input_size=1280 + 1, output_size=1)
     model = ConfigurableModel(architecture=architecture)
     trainer = Trainer(model=model, dataloader=dataloader)
-    trainer.train()
 
-    train_result = trainer.as_result()
-    train_result_loader = TrainResultLoader(train_result)
+    # results are streamed into the file epoch by epoch, so it can be read with TrainResultLoader.from_h5 mid-run
     save_dir = os.path.join(Dir.result_dir, "TRN0001")
     os.makedirs(save_dir, exist_ok=True)
-
-    train_result_loader.save_as_h5(os.path.join(save_dir, f"{i}.h5"))
+    trainer.train(stream_path=os.path.join(save_dir, f"{i}.h5"))
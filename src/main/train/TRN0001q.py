@@ -1,3 +1,4 @@
+from src.lib.config.dir import Dir
 from src.modules.data_pipeline.aggregator import Aggregator
 from src.modules.data_pipeline.data_pipeline import DataPipeline
 from src.modules.data_pipeline.initializer import Initializer
@@ -14,7 +15,9 @@ protein_list = ProteinList.from_hdf5("result/EXT0001q/plasma_lumos_1h/data.h5")
 
 aggregator = Aggregator("mean")
 initializer = Initializer()
-positional_encoder = SinusoidalPositionalEncoder(a=1000, b=1, gamma=0)
+positional_encoder = SinusoidalPositionalEncoder(
+    a=1000, b=1, gamma=0, max_length=protein_list.max_length, cache_dir=Dir.cache_dir
+)
 pipeline = DataPipeline(pipes=[initializer, positional_encoder, aggregator])
 dataloader_state = DataloaderState(
     {
@@ -1,6 +1,6 @@
 import statistics
 
-from src.modules.protein.protein_list import ProteinProp
+from src.modules.protein.protein import ProteinProp
 from src.modules.train.types import TrainResult
 
 
@@ -1,6 +1,7 @@
 from typing import Optional
 
 import h5py
+import numpy as np
 
 
 class HDF5:
@@ -17,3 +18,14 @@ class HDF5:
             return None
 
         return attrs[key]
+
+    @staticmethod
+    def create_nullable_column(key: str, values: list[Optional[float]], group: h5py.Group):
+        # nulls are stored as NaN so that the whole column is one float dataset
+        column = np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+        return group.create_dataset(key, data=column)
+
+    @staticmethod
+    def read_nullable_column(key: str, group: h5py.Group) -> np.ndarray:
+        # nulls stay NaN, which is how ProteinColumns holds its props
+        return group[key][:].astype(np.float64)
@@ -0,0 +1,58 @@
+import fcntl
+import hashlib
+import os
+from contextlib import contextmanager
+
+import h5py
+import torch
+
+
+class RepresentationStore:
+    representations_dir = "representations"
+
+    def __init__(self, path: str):
+        self._path = path
+
+    @property
+    def path(self):
+        return self._path
+
+    @contextmanager
+    def _locked(self, operation: int):
+        # several extractors may share a store, and HDF5 does not allow writes concurrent with other opens,
+        # so writes take an exclusive lock on a file next to the store and reads a shared one
+        with open(f"{self._path}.lock", mode="w") as lock:
+            fcntl.flock(lock, operation)
+            yield
+
+    @classmethod
+    def digest(cls, language_name: str, seq: str) -> str:
+        return hashlib.sha256(f"{language_name}:{seq}".encode()).hexdigest()
+
+    def read_digests(self, digests: list[str]) -> dict[str, torch.Tensor]:
+        if not os.path.exists(self._path):
+            return {}
+
+        representations: dict[str, torch.Tensor] = {}
+        with self._locked(fcntl.LOCK_SH), h5py.File(self._path, mode="r") as f:
+            group = f[self.representations_dir]
+            for digest in digests:
+                if digest in group:
+                    representations[digest] = torch.from_numpy(group[digest][:])
+
+        return representations
+
+    def read(self, language_name: str, seqs: list[str]) -> dict[str, torch.Tensor]:
+        digests = {seq: self.digest(language_name=language_name, seq=seq) for seq in seqs}
+        stored = self.read_digests(digests=list(digests.values()))
+
+        return {seq: stored[digest] for seq, digest in digests.items() if digest in stored}
+
+    def write(self, language_name: str, representations: dict[str, torch.Tensor]):
+        # entries are immutable, so sequences that are already stored are skipped
+        with self._locked(fcntl.LOCK_EX), h5py.File(self._path, mode="a") as f:
+            group = f.require_group(self.representations_dir)
+            for seq, representation in representations.items():
+                digest = self.digest(language_name=language_name, seq=seq)
+                if digest not in group:
+                    group.create_dataset(digest, data=representation.numpy(), dtype="float32")
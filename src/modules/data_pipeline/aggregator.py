@@ -2,12 +2,12 @@ from typing import Literal
 
 import torch
 
-from src.modules.data_pipeline.data_pipeline import DataPipe
+from src.modules.data_pipeline.data_pipeline import BatchDataPipe, PipedBatch
 
 AggregateMethod = Literal["mean"]
 
 
-class Aggregator(DataPipe):
+class Aggregator(BatchDataPipe):
     def __init__(self, method: AggregateMethod) -> None:
         self._method: AggregateMethod = method
 
@@ -18,5 +18,11 @@ class Aggregator(DataPipe):
 
         raise Exception
 
+    def _act_batch(self, batch: PipedBatch):
+        if self._method == "mean":
+            return batch.set_piped(piped=batch.mean(), aggregated=True)
+
+        raise Exception
+
     def _mean(self, input: torch.Tensor) -> torch.Tensor:
         return torch.mean(input=input, dim=0)
@@ -1,9 +1,123 @@
 import abc
+from typing import Optional
+
+import numpy as np
+import torch
 
 from src.modules.protein.protein import Protein
 from src.modules.protein.protein_list import ProteinList
 
 
+class PipedBatch:
+    # a batch packed as one (residues, dim) tensor, protein i owning the rows offsets[i]:offsets[i + 1]; nothing
+    # is padded, and while the piped rows are the batch's representations they stay in the shared residue matrix
+    def __init__(self, protein_list: ProteinList):
+        self._protein_list = protein_list
+        lengths = protein_list.lengths
+        self._lengths = torch.from_numpy(lengths)
+        self._offsets = np.concatenate([[0], np.cumsum(lengths)])
+        self._positions = torch.from_numpy(np.arange(self._offsets[-1]) - np.repeat(self._offsets[:-1], lengths))
+
+        # piped is per residue, or per protein once aggregated; with piped_rows set, the residues are those rows
+        # of piped rather than all of it in order
+        self._piped: Optional[torch.Tensor] = None
+        self._piped_rows: Optional[torch.Tensor] = None
+        self._aggregated = False
+
+    @property
+    def protein_list(self):
+        return self._protein_list
+
+    @property
+    def lengths(self):
+        return self._lengths
+
+    @property
+    def positions(self):
+        # the 0-based position of every residue within its protein
+        return self._positions
+
+    def _matrix_rows(self) -> Optional[tuple[torch.Tensor, torch.Tensor]]:
+        matrix_rows = self._protein_list.columns.matrix_rows(rows=self._protein_list.rows)
+        if matrix_rows is None:
+            return None
+
+        matrix, starts = matrix_rows
+        return matrix, torch.from_numpy(np.repeat(starts, self._protein_list.lengths)) + self._positions
+
+    @property
+    def representations(self) -> torch.Tensor:
+        # a new packed tensor on every call, so pipes may write into it
+        matrix_rows = self._matrix_rows()
+        if matrix_rows is not None:
+            return torch.index_select(matrix_rows[0], 0, matrix_rows[1])
+
+        return torch.cat([protein.representations for protein in self._protein_list.proteins])
+
+    def set_piped_representations(self):
+        matrix_rows = self._matrix_rows()
+        if matrix_rows is None:
+            return self.set_piped(piped=self.representations)
+
+        self._piped, self._piped_rows = matrix_rows
+        self._aggregated = False
+        return self
+
+    def _gather_piped(self):
+        pipeds = [protein.piped for protein in self._protein_list.proteins]
+        aggregated = pipeds[0].dim() == 1
+        return self.set_piped(piped=torch.stack(pipeds) if aggregated else torch.cat(pipeds), aggregated=aggregated)
+
+    @property
+    def piped(self) -> torch.Tensor:
+        if self._piped is None:
+            self._gather_piped()
+        elif self._piped_rows is not None:
+            self._piped = torch.index_select(self._piped, 0, self._piped_rows)
+            self._piped_rows = None
+
+        return self._piped
+
+    def set_piped(self, piped: torch.Tensor, aggregated: bool = False):
+        self._piped = piped
+        self._piped_rows = None
+        self._aggregated = aggregated
+        return self
+
+    def mean(self) -> torch.Tensor:
+        # one sparse (proteins, residues) @ (residues, dim) product; with piped rows it reads them in place
+        if self._piped is None:
+            self._gather_piped()
+        piped, rows = self._piped, self._piped_rows
+        if rows is None:
+            rows = torch.arange(piped.size(0))
+
+        weights = torch.repeat_interleave((1.0 / self._lengths).to(piped.dtype), self._lengths)
+        segments = torch.sparse_csr_tensor(
+            torch.from_numpy(self._offsets),
+            rows,
+            weights,
+            size=(len(self._lengths), piped.size(0)),
+            check_invariants=False,
+        )
+        return segments @ piped
+
+    def unpack(self) -> ProteinList:
+        proteins = self._protein_list.proteins
+        if self._piped_rows is not None:
+            for protein in proteins:
+                protein.set_piped(piped=protein.representations)
+            return self._protein_list
+
+        # the pieces are views of the packed tensor, which holds nothing but their rows
+        piped = self.piped
+        pieces = piped.unbind(0) if self._aggregated else torch.split(piped, self._protein_list.lengths.tolist())
+        for protein, piece in zip(proteins, pieces):
+            protein.set_piped(piped=piece)
+
+        return self._protein_list
+
+
 class DataPipe(metaclass=abc.ABCMeta):
     def __call__(self, protein_list: ProteinList) -> ProteinList:
         proteins = [self._act(protein=protein) for protein in protein_list.proteins]
@@ -14,12 +128,36 @@ class DataPipe(metaclass=abc.ABCMeta):
         raise NotImplementedError
 
 
+class BatchDataPipe(DataPipe, metaclass=abc.ABCMeta):
+    def act_batch(self, batch: PipedBatch) -> PipedBatch:
+        return self._act_batch(batch=batch)
+
+    @abc.abstractmethod
+    def _act_batch(self, batch: PipedBatch) -> PipedBatch:
+        raise NotImplementedError
+
+
 class DataPipeline:
-    def __init__(self, pipes: list[DataPipe]):
+    def __init__(self, pipes: list[DataPipe], batched: bool = False):
         self._pipes = pipes
+        self._batched = batched
 
     def __call__(self, protein_list: ProteinList):
+        batch: Optional[PipedBatch] = None
         for pipe in self._pipes:
+            if self._batched and isinstance(pipe, BatchDataPipe):
+                if batch is None:
+                    batch = PipedBatch(protein_list=protein_list)
+                batch = pipe.act_batch(batch=batch)
+                continue
+
+            # pipes without a batched implementation run per protein
+            if batch is not None:
+                protein_list = batch.unpack()
+                batch = None
             protein_list = pipe(protein_list=protein_list)
 
+        if batch is not None:
+            protein_list = batch.unpack()
+
         return protein_list
@@ -1,5 +1,4 @@
 import torch
-from torchdiffeq import odeint_adjoint as odeint
 
 from src.modules.data_pipeline.data_pipeline import DataPipe
 from src.modules.positional_encoder.dynamics import Dynamics
@@ -24,6 +23,8 @@ class DynamicPositionalEncoder(DataPipe):
         return p0
 
     def _generate_positions(self) -> torch.Tensor:
+        from torchdiffeq import odeint_adjoint as odeint
+
         positions: torch.Tensor = odeint(self._dynamics, self._p0, self._t_eval, method="rk4")
 
         return positions
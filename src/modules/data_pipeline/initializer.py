@@ -1,7 +1,10 @@
-from src.modules.data_pipeline.data_pipeline import DataPipe
+from src.modules.data_pipeline.data_pipeline import BatchDataPipe, PipedBatch
 from src.modules.protein.protein import Protein
 
 
-class Initializer(DataPipe):
+class Initializer(BatchDataPipe):
     def _act(self, protein: Protein):
         return protein.set_piped(piped=protein.representations)
+
+    def _act_batch(self, batch: PipedBatch):
+        return batch.set_piped_representations()
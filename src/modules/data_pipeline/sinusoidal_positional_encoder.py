@@ -1,11 +1,42 @@
-import math
+import abc
+import fcntl
+import os
+import tempfile
+from typing import Literal, Optional
 
+import numpy as np
 import torch
 
-from src.modules.data_pipeline.data_pipeline import DataPipe
+from src.modules.data_pipeline.data_pipeline import BatchDataPipe, PipedBatch
 from src.modules.protein.protein import Protein
 
 
+class SinusoidalPositionalTable:
+    dim = 1280
+
+    @classmethod
+    def _exponents(cls) -> torch.Tensor:
+        i = torch.arange(1, cls.dim + 1, dtype=torch.float64)
+        return torch.where(i // 2 == 0, (i - 1) / cls.dim, (i - 2) / cls.dim)
+
+    @classmethod
+    def generate(cls, a: float, b: float, gamma: float, positions: torch.Tensor) -> torch.Tensor:
+        # computed in float64 to match the former math.sin based implementation before casting to float32
+        positions = positions.to(torch.float64).unsqueeze(1)
+        table = torch.sin(positions / (a ** cls._exponents())) ** b + gamma
+        return table.to(torch.float32)
+
+    @classmethod
+    def normal(cls, a: float, b: float, gamma: float, length: int) -> torch.Tensor:
+        positions = torch.arange(1, length + 1)
+        return cls.generate(a=a, b=b, gamma=gamma, positions=positions)
+
+    @classmethod
+    def reversed(cls, a: float, b: float, gamma: float, length: int) -> torch.Tensor:
+        positions = torch.arange(length, 0, -1)
+        return cls.generate(a=a, b=b, gamma=gamma, positions=positions)
+
+
 class SinusoidalPositionalEncoderCache:
     def __init__(self) -> None:
         self._cache: dict[int, torch.Tensor] = {}
@@ -17,103 +48,182 @@ class SinusoidalPositionalEncoderCache:
         self._cache[length] = value
 
 
-class SinusoidalPositionalEncoder(DataPipe):
-    def __init__(self, a: float, b: float, gamma: float) -> None:
+SinusoidalPositionalDirection = Literal["normal", "reversed", "bidirectional"]
+
+
+class SinusoidalPositionalEncoderDiskCache:
+    def __init__(
+        self, cache_dir: str, direction: SinusoidalPositionalDirection, a: float, b: float, gamma: float
+    ) -> None:
+        self._path = os.path.join(cache_dir, f"{direction}_a{float(a)!r}_b{float(b)!r}_gamma{float(gamma)!r}.npy")
+        self._table: Optional[torch.Tensor] = None
+
+    @property
+    def path(self):
+        return self._path
+
+    def _load(self):
+        if not os.path.exists(self._path):
+            return None
+
+        # copy-on-write mapping, so that processes reading the same file share its pages
+        return torch.from_numpy(np.load(self._path, mmap_mode="c"))
+
+    def read(self, length: int):
+        if self._table is None or self._table.size(0) < length:
+            # another run or worker may have stored a longer table in the meantime
+            self._table = self._load()
+
+        if self._table is None or self._table.size(0) < length:
+            return None
+
+        return self._table
+
+    def _stored_length(self) -> int:
+        if not os.path.exists(self._path):
+            return 0
+
+        return np.load(self._path, mmap_mode="r").shape[0]
+
+    def write(self, table: torch.Tensor):
+        if self._table is not None and self._table.size(0) >= table.size(0):
+            return
+
+        # written to a temporary file and renamed, so that concurrent readers never see a partial table
+        directory = os.path.dirname(self._path)
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=directory, suffix=".npy", delete=False) as f:
+            temp_path = f.name
+        try:
+            np.save(temp_path, table.numpy())
+            # writers are serialized around the rename, so that a shorter table never replaces a longer one
+            with open(f"{self._path}.lock", mode="w") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                if self._stored_length() < table.size(0):
+                    os.replace(temp_path, self._path)
+        finally:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+
+        self._table = table
+
+
+class _SinusoidalPositionalEncoder(BatchDataPipe, metaclass=abc.ABCMeta):
+    direction: SinusoidalPositionalDirection
+
+    def __init__(
+        self,
+        a: float,
+        b: float,
+        gamma: float,
+        max_length: Optional[int] = None,
+        cache_dir: Optional[str] = None,
+    ) -> None:
         self._a = a
         self._b = b
         self._gamma = gamma
         self._cache = SinusoidalPositionalEncoderCache()
 
+        # with cache_dir, tables are shared across runs through a memory-mapped file per parameter set
+        self._disk_cache: Optional[SinusoidalPositionalEncoderDiskCache] = None
+        if cache_dir is not None:
+            self._disk_cache = SinusoidalPositionalEncoderDiskCache(
+                cache_dir=cache_dir, direction=self.direction, a=a, b=b, gamma=gamma
+            )
+
+        # with max_length, a single table is built once and every length is served as a view of it
+        self._table: Optional[torch.Tensor] = None
+        if max_length is not None:
+            self._table = self._load_positional_tensor(length=max_length)
+
     def _act(self, protein: Protein):
         piped = protein.representations * self._positional_tensor(length=protein.length)
         protein.set_piped(piped=piped)
         return protein
 
-    def _odd_positional_factor(self, p: int, i: int):
-        return (math.sin(p / (self._a ** ((i - 2) / 1280)))) ** self._b + self._gamma
+    def _act_batch(self, batch: PipedBatch):
+        piped = batch.representations.mul_(self._batch_positional_tensor(batch=batch))
+        return batch.set_piped(piped=piped)
 
-    def _even_positional_factor(self, p: int, i: int):
-        return (math.sin(p / (self._a ** ((i - 1) / 1280)))) ** self._b + self._gamma
+    def _batch_positional_tensor(self, batch: PipedBatch) -> torch.Tensor:
+        # the table row of every residue in the packed batch, gathered with one index
+        table = self._positional_tensor(length=int(batch.lengths.max()))
+        return torch.index_select(table, 0, self._positional_rows(table=table, batch=batch))
 
-    def _positional_vector(self, p: int):
-        positional_factors: list[float] = []
-        for i in range(1, 1280 + 1):
-            if i // 2 == 0:
-                positional_factors.append(self._even_positional_factor(p, i))
-            else:
-                positional_factors.append(self._odd_positional_factor(p, i))
-
-        return positional_factors
+    def _reversed_positional_rows(self, table: torch.Tensor, batch: PipedBatch) -> torch.Tensor:
+        # the table holds the positions max_length..1, so each protein starts (max_length - length) rows in
+        return torch.repeat_interleave(table.size(0) - batch.lengths, batch.lengths) + batch.positions
 
     def _positional_tensor(self, length: int) -> torch.Tensor:
+        if self._table is not None:
+            if length > self._table.size(0):
+                self._table = self._load_positional_tensor(length=length)
+
+            return self._slice_positional_table(table=self._table, length=length)
+
         cached = self._cache.read(length=length)
         if cached is not None:
             return cached
 
-        positional_vectors = []
-        for p in range(1, length + 1):
-            positional_vector = self._positional_vector(p=p)
-            positional_vectors.append(positional_vector)
-
-        tensor = torch.Tensor(positional_vectors)
+        tensor = self._load_positional_tensor(length=length)
         self._cache.set(length=length, value=tensor)
 
-        return torch.Tensor(positional_vectors)
+        return tensor
 
+    def _load_positional_tensor(self, length: int) -> torch.Tensor:
+        if self._disk_cache is None:
+            return self._generate_positional_tensor(length=length)
 
-class ReversedSinusoidalPositionalEncoder(DataPipe):
-    def __init__(self, a: float, b: float, gamma: float) -> None:
-        self._a = a
-        self._b = b
-        self._gamma = gamma
-        self._cache = SinusoidalPositionalEncoderCache()
+        table = self._disk_cache.read(length=length)
+        if table is None:
+            table = self._generate_positional_tensor(length=length)
+            self._disk_cache.write(table=table)
 
-    def _act(self, protein: Protein):
-        piped = protein.representations * self._positional_tensor(length=protein.length)
-        protein.set_piped(piped=piped)
-        return protein
+        return self._slice_positional_table(table=table, length=length)
 
-    def _odd_positional_factor(self, p: int, i: int):
-        return (math.sin(p / (self._a ** ((i - 2) / 1280)))) ** self._b + self._gamma
+    @abc.abstractmethod
+    def _generate_positional_tensor(self, length: int) -> torch.Tensor:
+        raise NotImplementedError
 
-    def _even_positional_factor(self, p: int, i: int):
-        return (math.sin(p / (self._a ** ((i - 1) / 1280)))) ** self._b + self._gamma
+    @abc.abstractmethod
+    def _slice_positional_table(self, table: torch.Tensor, length: int) -> torch.Tensor:
+        raise NotImplementedError
 
-    def _positional_vector(self, p: int):
-        positional_factors: list[float] = []
-        for i in range(1, 1280 + 1):
-            if i // 2 == 0:
-                positional_factors.append(self._even_positional_factor(p, i))
-            else:
-                positional_factors.append(self._odd_positional_factor(p, i))
+    @abc.abstractmethod
+    def _positional_rows(self, table: torch.Tensor, batch: PipedBatch) -> torch.Tensor:
+        raise NotImplementedError
 
-        return positional_factors
 
-    def _positional_tensor(self, length: int) -> torch.Tensor:
-        cached = self._cache.read(length=length)
-        if cached is not None:
-            return cached
+class SinusoidalPositionalEncoder(_SinusoidalPositionalEncoder):
+    direction = "normal"
 
-        positional_vectors = []
-        for p in reversed(range(1, length + 1)):
-            positional_vector = self._positional_vector(p=p)
-            positional_vectors.append(positional_vector)
+    def _generate_positional_tensor(self, length: int) -> torch.Tensor:
+        return SinusoidalPositionalTable.normal(a=self._a, b=self._b, gamma=self._gamma, length=length)
 
-        tensor = torch.Tensor(positional_vectors)
-        self._cache.set(length=length, value=tensor)
+    def _slice_positional_table(self, table: torch.Tensor, length: int) -> torch.Tensor:
+        return table[:length]
 
-        return torch.Tensor(positional_vectors)
+    def _positional_rows(self, table: torch.Tensor, batch: PipedBatch) -> torch.Tensor:
+        # every protein starts at position 1, so a residue's row is its position
+        return batch.positions
 
 
-class BidirectionalSinusoidalPositionalEncoder(DataPipe):
-    def __init__(self, a: float, b: float, gamma: float) -> None:
-        self._a = a
-        self._b = b
-        self._gamma = gamma
-        self._normal = SinusoidalPositionalEncoder(a=a, b=b, gamma=gamma)
-        self._reversed = ReversedSinusoidalPositionalEncoder(a=a, b=b, gamma=gamma)
+class ReversedSinusoidalPositionalEncoder(_SinusoidalPositionalEncoder):
+    direction = "reversed"
 
-        self._cache = SinusoidalPositionalEncoderCache()
+    def _generate_positional_tensor(self, length: int) -> torch.Tensor:
+        return SinusoidalPositionalTable.reversed(a=self._a, b=self._b, gamma=self._gamma, length=length)
+
+    def _slice_positional_table(self, table: torch.Tensor, length: int) -> torch.Tensor:
+        # rows run from max_length down to 1, so the last rows are the positions length..1
+        return table[table.size(0) - length :]  # noqa: E203
+
+    def _positional_rows(self, table: torch.Tensor, batch: PipedBatch) -> torch.Tensor:
+        return self._reversed_positional_rows(table=table, batch=batch)
+
+
+class BidirectionalSinusoidalPositionalEncoder(_SinusoidalPositionalEncoder):
+    direction = "bidirectional"
 
     def _act(self, protein: Protein):
         representations = torch.concat([protein.representations, protein.representations], dim=1)
@@ -121,28 +231,19 @@ class BidirectionalSinusoidalPositionalEncoder(DataPipe):
         protein.set_piped(piped=piped)
         return protein
 
-    def _odd_positional_factor(self, p: int, i: int):
-        return (math.sin(p / (self._a ** ((i - 2) / 1280)))) ** self._b + self._gamma
-
-    def _even_positional_factor(self, p: int, i: int):
-        return (math.sin(p / (self._a ** ((i - 1) / 1280)))) ** self._b + self._gamma
-
-    def _positional_vector(self, p: int):
-        normal_pt = self._normal._positional_vector(p=p)
-        reversed_pt = self._reversed._positional_vector(p=p)
-        return normal_pt + reversed_pt
+    def _act_batch(self, batch: PipedBatch):
+        representations = batch.representations
+        representations = torch.concat([representations, representations], dim=1)
+        piped = representations.mul_(self._batch_positional_tensor(batch=batch))
+        return batch.set_piped(piped=piped)
 
-    def _positional_tensor(self, length: int) -> torch.Tensor:
-        cached = self._cache.read(length=length)
-        if cached is not None:
-            return cached
-
-        positional_vectors = []
-        for p in reversed(range(1, length + 1)):
-            positional_vector = self._positional_vector(p=p)
-            positional_vectors.append(positional_vector)
+    def _generate_positional_tensor(self, length: int) -> torch.Tensor:
+        # both halves are read in reversed order, as the former per-position implementation did
+        reversed_tensor = SinusoidalPositionalTable.reversed(a=self._a, b=self._b, gamma=self._gamma, length=length)
+        return torch.concat([reversed_tensor, reversed_tensor], dim=1)
 
-        tensor = torch.Tensor(positional_vectors)
-        self._cache.set(length=length, value=tensor)
+    def _slice_positional_table(self, table: torch.Tensor, length: int) -> torch.Tensor:
+        return table[table.size(0) - length :]  # noqa: E203
 
-        return torch.Tensor(positional_vectors)
+    def _positional_rows(self, table: torch.Tensor, batch: PipedBatch) -> torch.Tensor:
+        return self._reversed_positional_rows(table=table, batch=batch)
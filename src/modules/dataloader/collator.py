@@ -0,0 +1,84 @@
+from typing import Optional
+
+import numpy as np
+import torch
+
+from src.modules.dataloader.feature_matrix import FeatureMatrix
+from src.modules.protein.protein_list import ProteinList, ProteinProp
+
+
+class BatchCollator:
+    def __init__(
+        self,
+        protein_list: ProteinList,
+        input_props: list[ProteinProp],
+        output_props: list[ProteinProp],
+        batch_size: int,
+    ):
+        self._protein_list = protein_list
+        self._input_props = input_props
+        self._output_props = output_props
+        self._batch_size = batch_size
+
+        # props of the whole list as float32 matrices, indexed by position in the list
+        self._input_matrix: Optional[torch.Tensor] = None
+        self._output_matrix: Optional[torch.Tensor] = None
+        # feature matrix row of every position in the list
+        self._feature_rows: Optional[torch.Tensor] = None
+        self._feature_matrix: Optional[FeatureMatrix] = None
+
+        # one set of buffers per slot, so that batches prepared ahead of time do not share memory
+        self._buffers: dict[tuple[str, int], torch.Tensor] = {}
+
+    def _prop_matrices(self):
+        if self._input_matrix is None or self._output_matrix is None:
+            self._input_matrix = torch.from_numpy(self._protein_list.read_props(self._input_props)).to(torch.float32)
+            self._output_matrix = torch.from_numpy(self._protein_list.read_props(self._output_props)).to(torch.float32)
+
+        return self._input_matrix, self._output_matrix
+
+    def _buffer(self, name: str, rows: int, width: int, dtype: torch.dtype, reuse: bool, slot: int) -> torch.Tensor:
+        if not reuse:
+            return torch.empty(rows, width, dtype=dtype)
+
+        # sized for a full batch and kept, so that every batch of an epoch writes into the same memory
+        buffer = self._buffers.get((name, slot))
+        if buffer is None or buffer.size(1) != width or buffer.dtype != dtype or buffer.size(0) < rows:
+            buffer = torch.empty(max(rows, self._batch_size), width, dtype=dtype)
+            self._buffers[(name, slot)] = buffer
+
+        return buffer[:rows]
+
+    def collate(self, indices: np.ndarray, piped: list[torch.Tensor], reuse: bool = True, slot: int = 0):
+        # with reuse, the returned tensors are overwritten by the next collate into the same slot
+        input_matrix, output_matrix = self._prop_matrices()
+        positions = torch.from_numpy(indices)
+        rows = len(indices)
+        dim = piped[0].size(0)
+
+        stacked = self._buffer("piped", rows, dim, piped[0].dtype, reuse, slot)
+        torch.stack(piped, out=stacked)
+        input_props = self._buffer("input_props", rows, len(self._input_props), torch.float32, reuse, slot)
+        torch.index_select(input_matrix, 0, positions, out=input_props)
+
+        inputs = self._buffer("inputs", rows, dim + len(self._input_props), torch.float32, reuse, slot)
+        torch.cat([stacked, input_props], dim=1, out=inputs)
+        outputs = self._buffer("outputs", rows, len(self._output_props), torch.float32, reuse, slot)
+        torch.index_select(output_matrix, 0, positions, out=outputs)
+
+        return inputs, outputs
+
+    def collate_feature_matrix(
+        self, indices: np.ndarray, feature_matrix: FeatureMatrix, reuse: bool = True, slot: int = 0
+    ):
+        if self._feature_rows is None or self._feature_matrix is not feature_matrix:
+            self._feature_rows = feature_matrix.indices(protein_list=self._protein_list)
+            self._feature_matrix = feature_matrix
+
+        rows = self._feature_rows[torch.from_numpy(indices)]
+        inputs = self._buffer("inputs", len(indices), feature_matrix.inputs.size(1), torch.float32, reuse, slot)
+        torch.index_select(feature_matrix.inputs, 0, rows, out=inputs)
+        outputs = self._buffer("outputs", len(indices), feature_matrix.outputs.size(1), torch.float32, reuse, slot)
+        torch.index_select(feature_matrix.outputs, 0, rows, out=outputs)
+
+        return inputs, outputs
@@ -1,10 +1,28 @@
-from typing import Optional, TypedDict
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Iterator, Literal, NotRequired, Optional, TypedDict
 
+import numpy as np
 import torch
 
 from src.modules.data_pipeline.data_pipeline import DataPipeline
+from src.modules.dataloader.collator import BatchCollator
+from src.modules.dataloader.feature_matrix import FeatureMatrix
+from src.modules.dataloader.sampler import EpochSampler
 from src.modules.protein.protein_list import ProteinList, ProteinProp
 
+if TYPE_CHECKING:
+    from src.modules.dataloader.torch_dataloader import TorchDataloaderAdapter
+
+DataloaderPrefetchMode = Literal["thread", "process"]
+
+
+class DataloaderPrefetch(TypedDict):
+    # batches prepared ahead of the one in use, and the workers preparing them
+    depth: int
+    workers: int
+    mode: NotRequired[DataloaderPrefetchMode]
+
 
 class DataloaderStateSource(TypedDict):
     protein_list: ProteinList
@@ -13,6 +31,9 @@ class DataloaderStateSource(TypedDict):
     output_props: list[ProteinProp]
     pipeline: DataPipeline
     cacheable: bool
+    feature_matrix: NotRequired[Optional[FeatureMatrix]]
+    seed: NotRequired[int]
+    prefetch: NotRequired[Optional[DataloaderPrefetch]]
 
 
 UsableDataBatch = tuple[torch.Tensor, torch.Tensor, ProteinList]
@@ -21,10 +42,11 @@ UsableDataBatch = tuple[torch.Tensor, torch.Tensor, ProteinList]
 class DataloaderState:
     def __init__(self, source: DataloaderStateSource):
         self._source = source
+        self._collator: Optional[BatchCollator] = None
 
     @property
     def protein_list(self):
-        return self._source["protein_list"].shuffle()
+        return self._source["protein_list"]
 
     @property
     def batch_size(self):
@@ -46,6 +68,42 @@ class DataloaderState:
     def cacheable(self):
         return self._source["cacheable"]
 
+    @property
+    def feature_matrix(self):
+        return self._source.get("feature_matrix")
+
+    @property
+    def seed(self):
+        return self._source.get("seed", 0)
+
+    @property
+    def prefetch(self):
+        return self._source.get("prefetch")
+
+    @property
+    def collator(self):
+        # shared by every batch of this state, so that they all collate into the same buffers
+        if self._collator is None:
+            self._collator = BatchCollator(
+                protein_list=self._source["protein_list"],
+                input_props=self._source["input_props"],
+                output_props=self._source["output_props"],
+                batch_size=self._source["batch_size"],
+            )
+
+        return self._collator
+
+    def precompute(self, release: bool = True):
+        self._source["feature_matrix"] = FeatureMatrix.build(
+            protein_list=self._source["protein_list"],
+            pipeline=self._source["pipeline"],
+            input_props=self._source["input_props"],
+            output_props=self._source["output_props"],
+            batch_size=self._source["batch_size"],
+            release=release,
+        )
+        return self
+
     def as_source(self) -> DataloaderStateSource:
         return {
             "protein_list": self._source["protein_list"],
@@ -54,6 +112,9 @@ class DataloaderState:
             "output_props": self._source["output_props"],
             "pipeline": self._source["pipeline"],
             "cacheable": self._source["cacheable"],
+            "feature_matrix": self._source.get("feature_matrix"),
+            "seed": self.seed,
+            "prefetch": self.prefetch,
         }
 
     def rational_split(self, ratios: list[float]) -> list["DataloaderState"]:
@@ -80,13 +141,27 @@ class DataloaderState:
 
 
 class DataBatch:
-    def __init__(self, state: DataloaderState):
+    def __init__(self, state: DataloaderState, indices: np.ndarray):
         self._state = state
+        # positions in the state's protein list; the list itself is never reordered
+        self._indices = indices
 
+        self._protein_list: Optional[ProteinList] = None
         self._cache: Optional[UsableDataBatch] = None
 
     def __len__(self):
-        return len(self._state.protein_list)
+        return len(self._indices)
+
+    @property
+    def indices(self):
+        return self._indices
+
+    @property
+    def protein_list(self):
+        if self._protein_list is None:
+            self._protein_list = self._state.protein_list.take(positions=self._indices)
+
+        return self._protein_list
 
     @property
     def input_props(self):
@@ -96,31 +171,46 @@ class DataBatch:
     def output_props(self):
         return self._state.output_props
 
-    def use(self):
-        if self._state.cacheable and self._cache is not None:
-            return self._cache
-
-        inputs = []
-        outputs = []
+    @property
+    def cached(self):
+        return self._cache is not None
 
-        protein_list = self._state.pipeline(protein_list=self._state.protein_list)
+    def use(self, slot: int = 0, reuse: bool = True) -> UsableDataBatch:
+        if self._cache is not None:
+            return self._cache
 
-        for protein in protein_list.proteins:
-            piped = protein.piped
-            input_props = torch.Tensor([protein.read_props(key) for key in self._state.input_props])
-            input = torch.cat([piped, input_props], dim=0)
-            inputs.append(input)
+        usable = self.prepare(slot=slot, reuse=reuse)
+        if self._state.cacheable and self._state.feature_matrix is None:
+            self._cache = usable
 
-            output = [protein.read_props(key) for key in self._state.output_props]
-            outputs.append(output)
+        return usable
 
-        usable = (
-            torch.stack(inputs).to(torch.float32),
-            torch.Tensor(outputs).to(torch.float32),
-            self._state.protein_list,
+    def prepare(self, slot: int = 0, reuse: bool = True) -> UsableDataBatch:
+        # cached batches get tensors of their own; the others are collated into the state's shared buffers of
+        # the given slot, which the next batch of that slot overwrites
+        reuse = reuse and not self._state.cacheable
+        feature_matrix = self._state.feature_matrix
+        if feature_matrix is not None:
+            inputs, outputs = self._state.collator.collate_feature_matrix(
+                indices=self._indices, feature_matrix=feature_matrix, reuse=reuse, slot=slot
+            )
+            return inputs, outputs, self.protein_list
+
+        protein_list = self._state.pipeline(protein_list=self.protein_list)
+        inputs, outputs = self._state.collator.collate(
+            indices=self._indices, piped=[protein.piped for protein in protein_list.proteins], reuse=reuse, slot=slot
         )
+        return inputs, outputs, protein_list
 
-        if self._state.cacheable:
+    def restore(self, inputs: torch.Tensor, outputs: torch.Tensor, piped: Optional[list[torch.Tensor]]):
+        # a batch prepared elsewhere, i.e. by a worker process, is kept as if it had been used here
+        protein_list = self.protein_list
+        if piped is not None:
+            for protein, tensor in zip(protein_list.proteins, piped):
+                protein.set_piped(piped=tensor)
+
+        usable = (inputs, outputs, protein_list)
+        if self._state.cacheable and self._state.feature_matrix is None:
             self._cache = usable
 
         return usable
@@ -129,7 +219,11 @@ class DataBatch:
 class Dataloader:
     def __init__(self, state: DataloaderState):
         self._state = state
+        self._sampler = EpochSampler(size=len(state.protein_list), batch_size=state.batch_size, seed=state.seed)
+        self._epoch = 0
         self._batches: Optional[list[DataBatch]] = None
+        # process workers are started once and kept for every later epoch
+        self._adapter: Optional["TorchDataloaderAdapter"] = None
 
     def __len__(self):
         return len(self._state.protein_list)
@@ -142,13 +236,69 @@ class Dataloader:
     def state(self):
         return self._state
 
+    @property
+    def sampler(self):
+        return self._sampler
+
+    @property
+    def epoch(self):
+        return self._epoch
+
+    def set_epoch(self, epoch: int):
+        # batches are drawn from the sampler's permutation for this epoch
+        if epoch != self._epoch:
+            self._epoch = epoch
+            self._batches = None
+        return self
+
+    def precompute(self, release: bool = True):
+        # runs the pipeline over the whole dataset once; batches are then rows of one feature matrix
+        self._state.precompute(release=release)
+        self._batches = None
+        # workers hold a copy of the state from before the feature matrix
+        self._adapter = None
+        return self
+
+    def use(self) -> Iterator[UsableDataBatch]:
+        # the batches of the current epoch in order, prepared ahead of time when the state asks for prefetching
+        prefetch = self._state.prefetch
+        if prefetch is None or prefetch["depth"] < 1:
+            for batch in self.batches:
+                yield batch.use()
+        elif prefetch.get("mode", "thread") == "process":
+            from src.modules.dataloader.torch_dataloader import TorchDataloaderAdapter
+
+            if self._adapter is None:
+                self._adapter = TorchDataloaderAdapter(
+                    dataloader=self, workers=prefetch["workers"], depth=prefetch["depth"]
+                )
+            yield from self._adapter
+        else:
+            yield from self._use_prefetched(workers=prefetch["workers"], depth=prefetch["depth"])
+
+    def _use_prefetched(self, workers: int, depth: int) -> Iterator[UsableDataBatch]:
+        batches = self.batches
+        # batch i + depth is only submitted once batch i is handed out, i.e. after batch i - 1 was given back,
+        # so depth + 1 buffer slots are never in use by two batches at once
+        slots = depth + 1
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+            futures: deque[Future[UsableDataBatch]] = deque(
+                executor.submit(batch.use, slot=i % slots) for i, batch in enumerate(batches[:depth])
+            )
+            for i in range(len(batches)):
+                usable = futures.popleft().result()
+                if i + depth < len(batches):
+                    futures.append(executor.submit(batches[i + depth].use, slot=(i + depth) % slots))
+                yield usable
+
     def _generate_batch(self):
         if self._batches is not None:
             return self._batches
 
-        states = self._state.even_split(unit_size=self._state.batch_size)
-
-        batches = [DataBatch(state=state) for state in states]
+        # cached batches keep the first epoch's composition so that their pipeline outputs stay reusable;
+        # rows of a feature matrix are cheap to gather, so those batches are drawn anew every epoch
+        epoch = self._epoch if not self._state.cacheable or self._state.feature_matrix is not None else 0
+        batches = [DataBatch(state=self._state, indices=indices) for indices in self._sampler.batches(epoch)]
 
         self._batches = batches
         return batches
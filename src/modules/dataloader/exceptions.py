@@ -0,0 +1,6 @@
+class FeatureMatrixUnbuildableException(Exception):
+    def __init__(self, shape: tuple[int, ...]):
+        self._shape = shape
+
+    def __str__(self):
+        return f"Piped tensor of shape {self._shape} cannot be a feature matrix row"
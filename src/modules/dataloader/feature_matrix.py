@@ -0,0 +1,68 @@
+from typing import Optional
+
+import torch
+
+from src.modules.data_pipeline.data_pipeline import DataPipeline
+from src.modules.dataloader.exceptions import FeatureMatrixUnbuildableException
+from src.modules.protein.protein_list import ProteinList, ProteinProp
+
+
+class FeatureMatrix:
+    def __init__(self, inputs: torch.Tensor, outputs: torch.Tensor, rows: dict[str, int]):
+        self._inputs = inputs
+        self._outputs = outputs
+        self._rows = rows
+
+    @property
+    def inputs(self):
+        return self._inputs
+
+    @property
+    def outputs(self):
+        return self._outputs
+
+    def indices(self, protein_list: ProteinList) -> torch.Tensor:
+        return torch.tensor([self._rows[key] for key in protein_list.keys])
+
+    @classmethod
+    def build(
+        cls,
+        protein_list: ProteinList,
+        pipeline: DataPipeline,
+        input_props: list[ProteinProp],
+        output_props: list[ProteinProp],
+        batch_size: int,
+        release: bool = True,
+    ):
+        inputs: Optional[torch.Tensor] = None
+        outputs = torch.empty(len(protein_list), len(output_props), dtype=torch.float32)
+        rows: dict[str, int] = {}
+
+        # the pipeline runs chunk by chunk, so that only one chunk of per-residue tensors is piped at a time
+        row = 0
+        for chunk in protein_list.even_split(unit_size=batch_size):
+            chunk = pipeline(protein_list=chunk)
+            start = row
+            for protein in chunk.proteins:
+                piped = protein.piped
+                if piped.dim() != 1:
+                    raise FeatureMatrixUnbuildableException(shape=tuple(piped.shape))
+
+                if inputs is None:
+                    inputs = torch.empty(len(protein_list), piped.size(0) + len(input_props), dtype=torch.float32)
+
+                inputs[row, : piped.size(0)] = piped
+                rows[protein.key] = row
+                row += 1
+
+                if release:
+                    protein.release()
+
+            if inputs is not None and row > start:
+                inputs[start:row, inputs.size(1) - len(input_props) :] = torch.from_numpy(chunk.read_props(input_props))
+                outputs[start:row] = torch.from_numpy(chunk.read_props(output_props))
+
+        if inputs is None:
+            inputs = torch.empty(0, len(input_props), dtype=torch.float32)
+
+        return FeatureMatrix(inputs=inputs, outputs=outputs, rows=rows)
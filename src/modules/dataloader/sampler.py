@@ -0,0 +1,35 @@
+import numpy as np
+
+
+class EpochSampler:
+    def __init__(self, size: int, batch_size: int, seed: int = 0, shuffle: bool = True):
+        self._size = size
+        self._batch_size = batch_size
+        self._seed = seed
+        self._shuffle = shuffle
+
+    def __len__(self):
+        return -(-self._size // self._batch_size)
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def batch_size(self):
+        return self._batch_size
+
+    @property
+    def seed(self):
+        return self._seed
+
+    def permutation(self, epoch: int) -> np.ndarray:
+        if not self._shuffle:
+            return np.arange(self._size)
+
+        # one generator per (seed, epoch), so an epoch's order does not depend on how many were drawn before it
+        return np.random.default_rng((self._seed, epoch)).permutation(self._size)
+
+    def batches(self, epoch: int) -> list[np.ndarray]:
+        permutation = self.permutation(epoch=epoch)
+        return [permutation[i : i + self._batch_size] for i in range(0, self._size, self._batch_size)]  # noqa: E203
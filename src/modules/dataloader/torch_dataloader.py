@@ -0,0 +1,102 @@
+import math
+from typing import Iterator, Optional
+
+import torch
+import torch.utils.data
+
+from src.modules.dataloader.dataloader import Dataloader, UsableDataBatch
+
+PreparedDataBatch = tuple[torch.Tensor, torch.Tensor, Optional[tuple[torch.Tensor, list[torch.Size]]], int]
+
+
+def _collate(item: PreparedDataBatch):
+    # batches are assembled by DataBatch already, so items are passed through as they are
+    return item
+
+
+def _pack(tensors: list[torch.Tensor]) -> tuple[torch.Tensor, list[torch.Size]]:
+    # every tensor sent between processes takes a shared memory segment of its own, so the piped tensors of a
+    # batch travel flattened into one
+    return torch.cat([tensor.reshape(-1) for tensor in tensors]), [tensor.shape for tensor in tensors]
+
+
+def _unpack(packed: tuple[torch.Tensor, list[torch.Size]]) -> list[torch.Tensor]:
+    tensor, shapes = packed
+    pieces = torch.split(tensor, [math.prod(shape) for shape in shapes])
+    return [piece.view(shape) for piece, shape in zip(pieces, shapes)]
+
+
+class DataBatchDataset(torch.utils.data.Dataset):
+    def __init__(self, dataloader: Dataloader):
+        # a dataloader of its own over the same state, so that workers draw each epoch's batches themselves
+        self._dataloader = Dataloader(state=dataloader.state)
+
+    def __len__(self):
+        return len(self._dataloader.batches)
+
+    def __getitem__(self, item: tuple[int, int]) -> PreparedDataBatch:
+        epoch, index = item
+        batch = self._dataloader.set_epoch(epoch=epoch).batches[index]
+        # tensors of their own, since worker processes move them to shared memory instead of copying them;
+        # the piped outputs go back too, so the main process can set them and cache the batch
+        inputs, outputs, protein_list = batch.prepare(reuse=False)
+        piped = None
+        if self._dataloader.state.feature_matrix is None:
+            piped = _pack([protein.piped for protein in protein_list.proteins])
+
+        return inputs, outputs, piped, index
+
+
+class DataBatchSampler(torch.utils.data.Sampler):
+    def __init__(self):
+        self._items: list[tuple[int, int]] = []
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def set_items(self, items: list[tuple[int, int]]):
+        self._items = items
+        return self
+
+
+class TorchDataloaderAdapter:
+    def __init__(self, dataloader: Dataloader, workers: int, depth: int, multiprocessing_context: Optional[str] = None):
+        self._dataloader = dataloader
+        self._workers = workers
+        self._depth = depth
+        self._multiprocessing_context = multiprocessing_context
+
+        # only batches without a cached result in the main process are sent to the workers
+        self._sampler = DataBatchSampler()
+        self._loader = torch.utils.data.DataLoader(
+            DataBatchDataset(dataloader=dataloader),
+            batch_size=None,
+            sampler=self._sampler,
+            num_workers=workers,
+            collate_fn=_collate,
+            prefetch_factor=max(depth // max(workers, 1), 1) if workers > 0 else None,
+            multiprocessing_context=multiprocessing_context if workers > 0 else None,
+            persistent_workers=workers > 0,
+        )
+
+    def __len__(self):
+        return len(self._dataloader.batches)
+
+    def __iter__(self) -> Iterator[UsableDataBatch]:
+        batches = self._dataloader.batches
+        epoch = self._dataloader.epoch
+        self._sampler.set_items([(epoch, index) for index, batch in enumerate(batches) if not batch.cached])
+        # batches come back in submission order, which the DataLoader keeps by default
+        prepared = iter(self._loader) if len(self._sampler) > 0 else None
+        for batch in batches:
+            if prepared is None or batch.cached:
+                yield batch.use()
+                continue
+
+            inputs, outputs, piped, index = next(prepared)
+            yield batches[index].restore(
+                inputs=inputs, outputs=outputs, piped=_unpack(piped) if piped is not None else None
+            )
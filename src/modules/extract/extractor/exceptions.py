@@ -0,0 +1,3 @@
+class ExtractorStreamUnsupportedException(Exception):
+    def __str__(self):
+        return "Streaming extraction cannot be combined with a representation store"
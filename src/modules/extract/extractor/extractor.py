@@ -1,15 +1,112 @@
+from typing import Iterable, Optional
+
 from tqdm import tqdm
 
+from src.modules.data.hdf.representation_store import RepresentationStore
+from src.modules.extract.extractor.exceptions import ExtractorStreamUnsupportedException
+from src.modules.extract.extractor.hdf5_stream_writer import HDF5StreamWriter
 from src.modules.extract.language._language import _Language
+from src.modules.protein.protein import Protein
 from src.modules.protein.protein_list import ProteinList
 
 
 class Extractor:
-    def __init__(self, language: _Language):
+    def __init__(self, language: _Language, store: Optional[RepresentationStore] = None):
         self._language = language
+        self._store = store
+
+    def __call__(
+        self,
+        protein_list: ProteinList,
+        batch_size: int,
+        max_tokens: Optional[int] = None,
+        stream_path: Optional[str] = None,
+    ):
+        if stream_path is not None:
+            if self._store is not None:
+                raise ExtractorStreamUnsupportedException()
+
+            return self._stream(
+                protein_list=protein_list, batch_size=batch_size, max_tokens=max_tokens, stream_path=stream_path
+            )
+
+        if self._store is None:
+            return self._extract(protein_list=protein_list, batch_size=batch_size, max_tokens=max_tokens)
+
+        seqs = list({protein.seq for protein in protein_list.proteins})
+        stored = self._store.read(language_name=self._language.name, seqs=seqs)
+
+        # each sequence that is not stored yet is extracted once, however many proteins share it
+        missing: dict[str, Protein] = {}
+        for protein in protein_list.proteins:
+            if protein.seq not in stored and protein.seq not in missing:
+                missing[protein.seq] = protein
+
+        if len(missing) > 0:
+            self._extract(
+                protein_list=ProteinList(proteins=list(missing.values())), batch_size=batch_size, max_tokens=max_tokens
+            )
+            extracted = {seq: protein.representations for seq, protein in missing.items()}
+            self._store.write(language_name=self._language.name, representations=extracted)
+            stored.update(extracted)
+
+        for protein in protein_list.proteins:
+            protein.set_representations(stored[protein.seq])
+
+        return protein_list
+
+    def stream(
+        self,
+        protein_lists: Iterable[ProteinList],
+        batch_size: int,
+        stream_path: str,
+        max_tokens: Optional[int] = None,
+    ):
+        # chunks, e.g. from ProteinList.scan_csv, are extracted and written one after another into one file,
+        # so that a dataset larger than memory is never held at once
+        if self._store is not None:
+            raise ExtractorStreamUnsupportedException()
+
+        writer = HDF5StreamWriter(path=stream_path)
+        try:
+            for protein_list in protein_lists:
+                self._stream_batches(
+                    protein_list=protein_list, batch_size=batch_size, max_tokens=max_tokens, writer=writer
+                )
+        finally:
+            writer.close()
+
+    def _stream(self, protein_list: ProteinList, batch_size: int, max_tokens: Optional[int], stream_path: str):
+        self.stream(protein_lists=[protein_list], batch_size=batch_size, stream_path=stream_path, max_tokens=max_tokens)
+        return protein_list
+
+    def _stream_batches(
+        self, protein_list: ProteinList, batch_size: int, max_tokens: Optional[int], writer: HDF5StreamWriter
+    ):
+        # each batch is handed to a writer thread, which writes and releases it while the next batch is extracted;
+        # proteins already in the file from an earlier, interrupted run are skipped
+        remaining = [protein for protein in protein_list.proteins if str(protein.key) not in writer.completed_keys]
+        if len(remaining) == 0:
+            return
+
+        protein_lists = self._split(
+            protein_list=ProteinList(proteins=remaining), batch_size=batch_size, max_tokens=max_tokens
+        )
+
+        for batch in tqdm(protein_lists):
+            self._language(protein_list=batch)
+            writer.put(protein_list=batch)
+
+    def _split(self, protein_list: ProteinList, batch_size: int, max_tokens: Optional[int] = None):
+        # with max_tokens, batches are formed from length-sorted proteins under a padded token budget;
+        # representations are set on the proteins themselves, so they need no reordering afterwards
+        if max_tokens is None:
+            return protein_list.even_split(unit_size=batch_size)
+
+        return protein_list.token_split(max_tokens=max_tokens)
 
-    def __call__(self, protein_list: ProteinList, batch_size: int):
-        protein_lists = protein_list.even_split(unit_size=batch_size)
+    def _extract(self, protein_list: ProteinList, batch_size: int, max_tokens: Optional[int] = None):
+        protein_lists = self._split(protein_list=protein_list, batch_size=batch_size, max_tokens=max_tokens)
 
         for protein_list in tqdm(protein_lists):
             self._language(protein_list=protein_list)
@@ -0,0 +1,66 @@
+import queue
+import threading
+from typing import Optional
+
+import h5py
+
+from src.modules.protein.protein_list import ProteinList
+
+
+class HDF5StreamWriter:
+    def __init__(self, path: str, queue_size: int = 2):
+        self._file = h5py.File(path, mode="a")
+        self._group = self._file.require_group(ProteinList.proteins_dir)
+        self._completed_keys = self._prune()
+
+        # a bounded queue makes extraction wait for the writer instead of piling up batches in memory
+        self._queue: queue.Queue[Optional[ProteinList]] = queue.Queue(maxsize=queue_size)
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @property
+    def completed_keys(self):
+        return self._completed_keys
+
+    def _prune(self) -> set[str]:
+        # attrs are written last, so a dataset without them was interrupted mid-batch and is rewritten
+        completed_keys: set[str] = set()
+        for key in list(self._group.keys()):
+            if "seq" in self._group[key].attrs:
+                completed_keys.add(key)
+            else:
+                del self._group[key]
+
+        return completed_keys
+
+    def _run(self):
+        while True:
+            protein_list = self._queue.get()
+            if protein_list is None:
+                return
+
+            if self._error is not None:
+                continue
+
+            try:
+                for protein in protein_list.proteins:
+                    ProteinList.write_hdf5_protein(f=self._file, protein=protein)
+                    protein.release()
+                self._file.flush()
+            except BaseException as error:
+                self._error = error
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise self._error
+
+    def put(self, protein_list: ProteinList):
+        self._raise_error()
+        self._queue.put(protein_list)
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        self._file.close()
+        self._raise_error()
@@ -0,0 +1,96 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import torch
+import torch.multiprocessing
+from tqdm import tqdm
+
+from src.modules.extract.extractor.hdf5_stream_writer import HDF5StreamWriter
+from src.modules.extract.language._language import _Language
+from src.modules.protein.protein import Protein
+from src.modules.protein.protein_list import ProteinList
+
+_worker_language: Optional[_Language] = None
+
+
+def _initialize_worker(language: _Language, threads: int):
+    global _worker_language
+    _worker_language = language
+    torch.set_num_threads(threads)
+
+
+def _extract_shard(seqs: list[str]) -> tuple[torch.Tensor, list[int]]:
+    if _worker_language is None:
+        raise Exception
+
+    proteins = [
+        Protein(
+            source={
+                "raw": {"seq": seq, "representations": None, "piped": None},
+                "props": {"ccs": None, "rt": None, "mass": None, "charge": None, "length": None, "half_time": None},
+                "key": str(i),
+            }
+        )
+        for i, seq in enumerate(seqs)
+    ]
+    protein_list = ProteinList(proteins=proteins)
+    _worker_language(protein_list=protein_list)
+
+    # ProteinList shuffles its rows, but its columns hold the given proteins in order
+    columns = protein_list.columns
+    representations = [columns.representations(row) for row in range(len(proteins))]
+    offsets = [0]
+    for representation in representations:
+        offsets.append(offsets[-1] + representation.size(0))
+
+    # returned as one tensor, which torch.multiprocessing moves to shared memory
+    return torch.cat(representations), offsets
+
+
+class ShardedExtractor:
+    def __init__(self, language: _Language, processes: int, threads: int):
+        # the weights are loaded once here and shared with the forked workers instead of being loaded per process
+        self._language = language.share_memory()
+        self._processes = processes
+        self._threads = threads
+
+    def __call__(
+        self,
+        protein_list: ProteinList,
+        batch_size: int,
+        max_tokens: Optional[int] = None,
+        stream_path: Optional[str] = None,
+    ):
+        writer = HDF5StreamWriter(path=stream_path) if stream_path is not None else None
+        try:
+            proteins = protein_list.proteins
+            if writer is not None:
+                proteins = [protein for protein in proteins if str(protein.key) not in writer.completed_keys]
+
+            remaining = ProteinList(proteins=proteins)
+            if max_tokens is None:
+                protein_lists = remaining.even_split(unit_size=batch_size)
+            else:
+                protein_lists = remaining.token_split(max_tokens=max_tokens)
+
+            context = torch.multiprocessing.get_context("fork")
+            with ProcessPoolExecutor(
+                max_workers=self._processes,
+                mp_context=context,
+                initializer=_initialize_worker,
+                initargs=(self._language, self._threads),
+            ) as executor:
+                shards = [[protein.seq for protein in batch.proteins] for batch in protein_lists]
+                results = executor.map(_extract_shard, shards)
+
+                for batch, (representations, offsets) in zip(protein_lists, tqdm(results, total=len(shards))):
+                    for i, protein in enumerate(batch.proteins):
+                        protein.set_representations(representations[offsets[i] : offsets[i + 1]])  # noqa: E203
+
+                    if writer is not None:
+                        writer.put(protein_list=batch)
+        finally:
+            if writer is not None:
+                writer.close()
+
+        return protein_list
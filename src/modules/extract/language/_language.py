@@ -6,5 +6,14 @@ from src.modules.protein.protein_list import ProteinList
 
 
 class _Language(metaclass=abc.ABCMeta):
+    @property
+    @abc.abstractmethod
+    def name(self) -> str:
+        raise NotImplementedError()
+
     def __call__(self, protein_list: ProteinList) -> torch.Tensor:
         raise NotImplementedError()
+
+    def share_memory(self):
+        # languages holding model weights move them to shared memory, so that worker processes do not copy them
+        return self
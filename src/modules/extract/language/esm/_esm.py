@@ -3,7 +3,7 @@ from typing import Literal, TypedDict
 import torch
 
 from src.modules.extract.language._language import _Language
-from src.modules.extract.language.esm.esm_converter import ESMConverter
+from src.modules.extract.language.esm.esm_converter import ESMConverter, ESMPrecision
 from src.modules.protein.protein_list import ProteinList
 
 ESMModelName = Literal["esm2", "esm1b"]
@@ -17,9 +17,23 @@ class ESMModelResult(TypedDict):
 
 
 class _ESMLanguage(_Language):
-    def __init__(self, model_name: ESMModelName):
+    def __init__(self, model_name: ESMModelName, precision: ESMPrecision = "float32"):
         super().__init__()
-        self._converter = ESMConverter(model_name=model_name)
+        self._model_name: ESMModelName = model_name
+        self._precision: ESMPrecision = precision
+        self._converter = ESMConverter(model_name=model_name, precision=precision)
+
+    @property
+    def name(self) -> str:
+        # reduced precision representations are kept apart from the float32 ones in a representation store
+        if self._precision == "float32":
+            return self._model_name
+
+        return f"{self._model_name}_{self._precision}"
+
+    def share_memory(self):
+        self._converter.share_memory()
+        return self
 
     def __call__(self, protein_list: ProteinList):
         self._set_representations(protein_list=protein_list)
@@ -1,7 +1,9 @@
-from huggingface_hub import login
-
 # from esm.models.esm3 import ESM3
 # from esm.sdk.api import ESM3InferenceClient, ESMProtein, GenerationConfig
 
-# Will instruct you how to get an API key from huggingface hub, make one with "Read" permission.
-login()
+
+def login():
+    from huggingface_hub import login
+
+    # Will instruct you how to get an API key from huggingface hub, make one with "Read" permission.
+    login()
@@ -1,6 +1,7 @@
 from src.modules.extract.language.esm._esm import _ESMLanguage
+from src.modules.extract.language.esm.esm_converter import ESMPrecision
 
 
 class ESM1bLanguage(_ESMLanguage):
-    def __init__(self):
-        super().__init__("esm1b")
+    def __init__(self, precision: ESMPrecision = "float32"):
+        super().__init__("esm1b", precision=precision)
@@ -1,9 +1,9 @@
-from typing import Literal, TypedDict
+from typing import Literal, Optional, TypedDict
 
-import esm
 import torch
 
 ESMModelName = Literal["esm2", "esm1b"]
+ESMPrecision = Literal["float32", "int8", "bfloat16"]
 
 
 class ESMModelResult(TypedDict):
@@ -14,35 +14,89 @@ class ESMModelResult(TypedDict):
 
 
 class ESMConverter:
-    def __init__(self, model_name: ESMModelName):
+    def __init__(
+        self,
+        model_name: ESMModelName,
+        repr_layers: Optional[list[int]] = None,
+        return_contacts: bool = False,
+        precision: ESMPrecision = "float32",
+    ):
         super().__init__()
         self._model_name = model_name
         self._model, self._alphabet = self._get_model_and_alphabet()
         self._batch_converter = self._alphabet.get_batch_converter()
         self._model.eval()
 
+        # int8 replaces the linear layers with dynamically quantized ones; bfloat16 autocasts the forward pass
+        self._precision: ESMPrecision = precision
+        if precision == "int8":
+            self._model = self._quantize(model=self._model)
+
+        # only the final layer is kept by default; contacts need every layer's attention maps, so they are opt-in
+        self._repr_layers = repr_layers if repr_layers is not None else [len(self._model.layers)]
+        self._return_contacts = return_contacts
+        # __call__ returns the deepest of repr_layers, whatever order they are given in
+        self._layer = max(self._repr_layers)
+
+    @property
+    def repr_layers(self):
+        return self._repr_layers
+
+    @property
+    def layer(self):
+        return self._layer
+
+    @property
+    def precision(self):
+        return self._precision
+
+    def share_memory(self):
+        self._model.share_memory()
+        return self
+
     def __call__(self, seqs: list[str]):
+        return self.convert(seqs=seqs)[self._layer]
+
+    def convert(self, seqs: list[str]) -> dict[int, list[torch.Tensor]]:
         batch_tokens = self._batch_converter([(seq, seq) for seq in seqs])[2]
         batch_lens = (batch_tokens != self._alphabet.padding_idx).sum(1)
 
-        with torch.no_grad():
+        with torch.inference_mode(), torch.autocast("cpu", dtype=torch.bfloat16, enabled=self._precision == "bfloat16"):
             results: ESMModelResult = self._model(
                 batch_tokens,
-                repr_layers=[33],
-                return_contacts=True,
+                repr_layers=self._repr_layers,
+                return_contacts=self._return_contacts,
             )
-        token_representations: torch.Tensor = results["representations"][33]
 
-        sequence_representations: list[torch.Tensor] = []
-        for i, tokens_len in enumerate(batch_lens):
-            representation = token_representations[i, 1 : tokens_len - 1]
-            sequence_representations.append(representation)  # noqa: E203
-        return sequence_representations
+        layer_representations: dict[int, list[torch.Tensor]] = {}
+        for layer in self._repr_layers:
+            token_representations: torch.Tensor = results["representations"][layer].to(torch.float32)
+
+            sequence_representations: list[torch.Tensor] = []
+            for i, tokens_len in enumerate(batch_lens):
+                representation = token_representations[i, 1 : tokens_len - 1]  # noqa: E203
+                sequence_representations.append(representation)
+            layer_representations[layer] = sequence_representations
+
+        return layer_representations
+
+    def _quantize(self, model: torch.nn.Module) -> torch.nn.Module:
+        from esm.multihead_attention import MultiheadAttention
+
+        # ESM1b attention otherwise takes the fused torch path, which reads the projection weights directly
+        # and fails on quantized linear layers; ESM2 never takes it because of its rotary embeddings
+        for module in model.modules():
+            if isinstance(module, MultiheadAttention):
+                module.enable_torch_version = False
+
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
 
     def _get_model_and_alphabet(self):
         return self._get_model_alphabet()
 
     def _get_model_alphabet(self):
+        import esm
+
         if self._model_name == "esm2":
             return esm.pretrained.esm2_t33_650M_UR50D()
         if self._model_name == "esm1b":
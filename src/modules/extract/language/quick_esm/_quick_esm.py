@@ -1,9 +1,13 @@
 import os
+import shutil
+import tempfile
 from typing import Literal, TypedDict
 
 import h5py
+import numpy as np
 import torch
 
+from src.lib.config.dir import Dir
 from src.modules.extract.language._language import _Language
 from src.modules.protein.protein_list import ProteinList
 
@@ -15,17 +19,46 @@ class _AminoAcidSource(TypedDict):
 
 
 QuickESMModelName = Literal["esm2", "esm1b"]
+QuickESMContext = Literal["residue", "kmer"]
+QuickESMSourceTableName = Literal["amino_acid", "dipeptide", "tripeptide"]
+
+# source tables loaded in this process, shared by every language instance
+_source_tables: dict[tuple[QuickESMModelName, QuickESMSourceTableName], tuple[torch.Tensor, list[str]]] = {}
 
 
 class _QuickESMLanguage(_Language):
-    def __init__(self, model_name: QuickESMModelName):
+    # characters missing from the source are encoded as the unknown amino acid
+    fallback_char = "X"
+
+    def __init__(self, model_name: QuickESMModelName, context: QuickESMContext = "residue"):
         super().__init__()
         self._model_name: QuickESMModelName = model_name
-        self._source = self._load_source()
+        self._context: QuickESMContext = context
+        self._table, self._lookup = self._build_table()
+        if context == "kmer":
+            self._dipeptide_table, self._tripeptide_table, self._kmer_chars = self._build_kmer_tables()
+            self._kmer_lookup = self._build_lookup(self._kmer_chars)
+
+    @property
+    def name(self) -> str:
+        if self._context == "residue":
+            return f"quick_{self._model_name}"
+
+        return f"quick_{self._model_name}_{self._context}"
 
     def __call__(self, protein_list: ProteinList):
-        for protein in protein_list.proteins:
-            protein.set_representations(self._convert(protein.seq))
+        proteins = protein_list.proteins
+        if len(proteins) == 0:
+            return protein_list
+
+        # the whole batch is encoded with one gather and split back into per-protein views
+        lengths = [len(protein.seq) for protein in proteins]
+        if self._context == "kmer":
+            representations = self._convert_kmers("".join(protein.seq for protein in proteins), lengths)
+        else:
+            representations = self._convert("".join(protein.seq for protein in proteins))
+        for protein, representation in zip(proteins, torch.split(representations, lengths)):
+            protein.set_representations(representation)
 
         return protein_list
 
@@ -52,10 +85,114 @@ class _QuickESMLanguage(_Language):
 
         return source
 
-    def _convert(self, chars: str):
-        representations: list[torch.Tensor] = []
-        for char in list(chars):
-            representation = self._source[char]["representation"]
-            representations.append(representation)
+    def _get_sidecar_dir(self, table_name: QuickESMSourceTableName):
+        # named after the source's modification time, so that a changed source gets a new directory
+        # instead of replacing the files of one that processes may still map
+        path = self._get_source_path()
+        stem = os.path.splitext(os.path.basename(path))[0]
+        return os.path.join(Dir.cache_dir, "quick_esm", f"{stem}.{table_name}.{os.stat(path).st_mtime_ns}")
+
+    def _read_source_table(self, table_name: QuickESMSourceTableName) -> tuple[np.ndarray, list[str]]:
+        if table_name == "amino_acid":
+            source = self._load_source()
+            chars = list(source.keys())
+            return np.stack([source[char]["representation"].numpy() for char in chars]).astype(np.float32), chars
+
+        with h5py.File(self._get_source_path(), mode="r") as f:
+            dataset = f[table_name]
+            return dataset[:].astype(np.float32), list(dataset.attrs["chars"])
+
+    def _write_sidecar(self, table_name: QuickESMSourceTableName, sidecar_dir: str):
+        table, chars = self._read_source_table(table_name)
+
+        # both files are written into a temporary directory that is renamed in one step, so that concurrent
+        # processes never see a table without its chars
+        parent = os.path.dirname(sidecar_dir)
+        os.makedirs(parent, exist_ok=True)
+        temp_dir = tempfile.mkdtemp(dir=parent)
+        try:
+            np.save(os.path.join(temp_dir, "table.npy"), table)
+            np.save(os.path.join(temp_dir, "chars.npy"), np.array(chars))
+            os.rename(temp_dir, sidecar_dir)
+        except OSError:
+            # another process renamed its complete directory into place first
+            if not os.path.isdir(sidecar_dir):
+                raise
+        finally:
+            if os.path.exists(temp_dir):
+                shutil.rmtree(temp_dir)
+
+    def _load_table(self, table_name: QuickESMSourceTableName = "amino_acid") -> tuple[torch.Tensor, list[str]]:
+        loaded = _source_tables.get((self._model_name, table_name))
+        if loaded is not None:
+            return loaded
+
+        # the HDF5 source is flattened once into .npy sidecars in the cache dir, which are memory-mapped
+        # copy-on-write so that forked workers share the same pages
+        sidecar_dir = self._get_sidecar_dir(table_name)
+        if not os.path.isdir(sidecar_dir):
+            self._write_sidecar(table_name, sidecar_dir)
+
+        table = torch.from_numpy(np.load(os.path.join(sidecar_dir, "table.npy"), mmap_mode="c"))
+        chars: list[str] = np.load(os.path.join(sidecar_dir, "chars.npy")).tolist()
+        _source_tables[(self._model_name, table_name)] = (table, chars)
+
+        return table, chars
+
+    def _build_lookup(self, chars: list[str]) -> np.ndarray:
+        # maps every byte to an index into chars; unlisted bytes point at the fallback char
+        lookup = np.full(256, chars.index(self.fallback_char), dtype=np.int64)
+        for i, char in enumerate(chars):
+            lookup[ord(char)] = i
+
+        return lookup
+
+    def _build_table(self) -> tuple[torch.Tensor, np.ndarray]:
+        table, chars = self._load_table()
+        return table, self._build_lookup(chars)
+
+    def _build_kmer_tables(self) -> tuple[torch.Tensor, torch.Tensor, list[str]]:
+        dipeptide_table, chars = self._load_table("dipeptide")
+        tripeptide_table, _ = self._load_table("tripeptide")
+
+        # dipeptide rows are flattened so that row 2 * kmer + position holds the residue at that position
+        dipeptide_table = dipeptide_table.reshape(-1, dipeptide_table.shape[-1])
+        return dipeptide_table, tripeptide_table, chars
 
-        return torch.stack(representations)
+    def _convert(self, chars: str):
+        codes = np.frombuffer(chars.encode("ascii", errors="replace"), dtype=np.uint8)
+        indices = torch.from_numpy(self._lookup[codes])
+        return torch.index_select(self._table, 0, indices)
+
+    def _convert_kmers(self, chars: str, lengths: list[int]):
+        codes = np.frombuffer(chars.encode("ascii", errors="replace"), dtype=np.uint8)
+        indices = torch.from_numpy(self._kmer_lookup[codes])
+        size = len(self._kmer_chars)
+
+        ends = torch.tensor(lengths).cumsum(0)
+        starts = ends - torch.tensor(lengths)
+        nonempty = torch.tensor(lengths) > 0
+        first = torch.zeros(len(codes), dtype=torch.bool)
+        first[starts[nonempty]] = True
+        last = torch.zeros(len(codes), dtype=torch.bool)
+        last[ends[nonempty] - 1] = True
+
+        # inner residues are read between both neighbours, sequence ends next to their only neighbour
+        # and lone residues without context; neighbours wrapping across sequences are always masked out
+        previous = torch.roll(indices, 1)
+        following = torch.roll(indices, -1)
+        representations = torch.empty((len(codes), self._table.shape[-1]), dtype=self._table.dtype)
+        inner = ~first & ~last
+        head = first & ~last
+        tail = last & ~first
+        alone = first & last
+        rows = (previous[inner] * size + indices[inner]) * size + following[inner]
+        representations[inner] = torch.index_select(self._tripeptide_table, 0, rows)
+        rows = 2 * (indices[head] * size + following[head])
+        representations[head] = torch.index_select(self._dipeptide_table, 0, rows)
+        rows = 2 * (previous[tail] * size + indices[tail]) + 1
+        representations[tail] = torch.index_select(self._dipeptide_table, 0, rows)
+        rows = torch.from_numpy(self._lookup[codes[alone.numpy()]])
+        representations[alone] = torch.index_select(self._table, 0, rows)
+
+        return representations
@@ -1,9 +1,11 @@
+import itertools
 import os
 from typing import TypedDict
 
 import h5py
+import torch
 
-from src.modules.extract.language.esm.esm_converter import ESMConverter
+from src.modules.extract.language.esm.esm_converter import ESMConverter, ESMModelName
 
 
 class _AminoAcidSource(TypedDict):
@@ -39,30 +41,47 @@ _amino_acid_sources: list[_AminoAcidSource] = [
 ]
 
 
-def esm2():
-    esm2_converter = ESMConverter("esm2")
-    path = os.path.join(os.path.dirname(__file__), "esm2.h5")
+# k-mers are converted in batches, so that the tripeptide table never needs the whole model output at once
+kmer_batch_size = 512
+
+
+def _convert_kmers(converter: ESMConverter, k: int, dataset: h5py.Dataset):
+    chars = [source["char"] for source in _amino_acid_sources]
+    kmers = ["".join(kmer) for kmer in itertools.product(chars, repeat=k)]
+    for start in range(0, len(kmers), kmer_batch_size):
+        representations = torch.stack(converter(kmers[start : start + kmer_batch_size]))  # noqa: E203
+        # dipeptides keep both residues, tripeptides only the residue between its two neighbours
+        if k == 3:
+            representations = representations[:, 1]
+        dataset[start : start + len(representations)] = representations.numpy()  # noqa: E203
+
+
+def create_source(model_name: ESMModelName, path: str):
+    converter = ESMConverter(model_name)
     with h5py.File(name=path, mode="w") as f:
         f.create_group("amino_acid")
         for source in _amino_acid_sources:
-            representations = esm2_converter(list(source["char"])).squeeze(dim=0)
+            representations = converter([source["char"]])[0].squeeze(dim=0)
             dataset = f.create_dataset(f"amino_acid/{source['char']}", data=representations, dtype="float32")
             attrs = dataset.attrs
             attrs["name"] = source["name"]
             attrs["char"] = source["char"]
 
+        # k-mer tables are indexed by the k-mer read as a base len(chars) number over "chars"
+        dim = representations.shape[-1]
+        chars = "".join(source["char"] for source in _amino_acid_sources)
+        for name, k, shape in [("dipeptide", 2, (len(chars) ** 2, 2, dim)), ("tripeptide", 3, (len(chars) ** 3, dim))]:
+            dataset = f.create_dataset(name, shape=shape, dtype="float32")
+            dataset.attrs["chars"] = chars
+            _convert_kmers(converter=converter, k=k, dataset=dataset)
+
+
+def esm2():
+    create_source("esm2", os.path.join(os.path.dirname(__file__), "esm2.h5"))
+
 
 def esm1b():
-    esm1b_converter = ESMConverter("esm1b")
-    path = os.path.join(os.path.dirname(__file__), "esm1b.h5")
-    with h5py.File(name=path, mode="w") as f:
-        f.create_group("amino_acid")
-        for source in _amino_acid_sources:
-            representations = esm1b_converter(list(source["char"])).squeeze(dim=0)
-            dataset = f.create_dataset(f"amino_acid/{source['char']}", data=representations, dtype="float32")
-            attrs = dataset.attrs
-            attrs["name"] = source["name"]
-            attrs["char"] = source["char"]
+    create_source("esm1b", os.path.join(os.path.dirname(__file__), "esm1b.h5"))
 
 
 def main():
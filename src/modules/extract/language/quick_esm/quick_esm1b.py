@@ -1,6 +1,6 @@
-from src.modules.extract.language.quick_esm._quick_esm import _QuickESMLanguage
+from src.modules.extract.language.quick_esm._quick_esm import QuickESMContext, _QuickESMLanguage
 
 
 class QuickESM1bLanguage(_QuickESMLanguage):
-    def __init__(self):
-        super().__init__("esm1b")
+    def __init__(self, context: QuickESMContext = "residue"):
+        super().__init__("esm1b", context=context)
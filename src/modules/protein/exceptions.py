@@ -14,3 +14,20 @@ class ProteinPropsUnreadableException(Exception):
 
     def __str__(self):
         return f"Prop {self._name} is not readable"
+
+
+class HDF5RepresentationReaderClosedException(Exception):
+    def __str__(self):
+        return "Representations cannot be read after the reader is closed"
+
+
+class ProteinRepresentationsMissingException(Exception):
+    def __init__(self, store_path: str, keys: list[str], digests: list[str]):
+        self._store_path = store_path
+        self._keys = keys
+        self._digests = digests
+
+    def __str__(self):
+        missing = ", ".join(f"{key} ({digest})" for key, digest in zip(self._keys[:10], self._digests[:10]))
+        more = f" and {len(self._keys) - 10} more" if len(self._keys) > 10 else ""
+        return f"Representations of {len(self._keys)} proteins are missing from {self._store_path}: {missing}{more}"
@@ -0,0 +1,84 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import h5py
+import torch
+
+from src.modules.protein.exceptions import HDF5RepresentationReaderClosedException
+
+# dataset name, and the row range within it for the contiguous layout
+RepresentationLocation = tuple[str, Optional[int], Optional[int]]
+
+
+class HDF5RepresentationReader:
+    def __init__(self, path: str, max_bytes: int):
+        self._path = path
+        self._file: Optional[h5py.File] = None
+        # pid of the process that opened the file; a forked worker opens its own instead of using the inherited one
+        self._pid: Optional[int] = None
+        self._closed = False
+        self._max_bytes = max_bytes
+        self._resident: OrderedDict[RepresentationLocation, torch.Tensor] = OrderedDict()
+        self._resident_bytes = 0
+        # prefetching dataloaders read from several threads
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def file(self):
+        with self._lock:
+            return self._open()
+
+    def _open(self) -> h5py.File:
+        if self._closed:
+            raise HDF5RepresentationReaderClosedException()
+
+        if self._file is None or self._pid != os.getpid():
+            self._file = h5py.File(self._path, mode="r")
+            self._pid = os.getpid()
+
+        return self._file
+
+    @property
+    def resident_bytes(self):
+        return self._resident_bytes
+
+    def read(self, location: RepresentationLocation) -> torch.Tensor:
+        with self._lock:
+            resident = self._resident.get(location)
+            if resident is not None:
+                self._resident.move_to_end(location)
+                return resident
+
+            name, start, stop = location
+            dataset = self._open()[name]
+            representations = torch.from_numpy(dataset[start:stop] if start is not None else dataset[:])
+            self._admit(location=location, representations=representations)
+
+            return representations
+
+    def _admit(self, location: RepresentationLocation, representations: torch.Tensor):
+        self._resident[location] = representations
+        self._resident_bytes += representations.nbytes
+
+        # least recently read representations are dropped first; callers still holding them keep them alive
+        while self._resident_bytes > self._max_bytes and len(self._resident) > 1:
+            _, evicted = self._resident.popitem(last=False)
+            self._resident_bytes -= evicted.nbytes
+
+    def close(self):
+        with self._lock:
+            self._resident.clear()
+            self._resident_bytes = 0
+            self._closed = True
+            # a forked worker leaves the handle it inherited to the process that opened it
+            if self._file is not None and self._pid == os.getpid():
+                self._file.close()
+            self._file = None
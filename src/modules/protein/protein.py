@@ -1,6 +1,6 @@
-from typing import Literal, Optional, Required, TypedDict
+from typing import TYPE_CHECKING, Literal, Optional, Required, Sequence, TypedDict
 
-import torch
+import numpy as np
 
 from src.modules.protein.exceptions import (
     ProteinPipedUnavailableException,
@@ -8,16 +8,24 @@ from src.modules.protein.exceptions import (
     ProteinRepresentationsUnavailableException,
 )
 
+# torch is only needed for annotations here, so that props-only jobs can import proteins without it
+if TYPE_CHECKING:
+    import torch
+
+    from src.modules.protein.lazy_protein import HDF5RepresentationReader, RepresentationLocation
+
 ProteinLanguageName = Literal["esm2", "esm1b"]
 protein_language_names: list[ProteinLanguageName] = ["esm2", "esm1b"]
 ProteinPropName = Literal["ccs", "rt", "mass", "length", "charge"]
 protein_prop_names: list[ProteinPropName] = ["ccs", "rt", "mass", "length", "charge"]
+ProteinProp = Literal["ccs", "rt", "mass", "length", "charge", "half_time"]
+protein_props: list[ProteinProp] = ["ccs", "rt", "mass", "length", "charge", "half_time"]
 
 
 class ProteinRaw(TypedDict):
     seq: Required[str]
-    representations: Optional[torch.Tensor]
-    piped: Optional[torch.Tensor]
+    representations: Optional["torch.Tensor"]
+    piped: Optional["torch.Tensor"]
 
 
 class ProteinProps(TypedDict):
@@ -35,57 +43,290 @@ class ProteinSource(TypedDict):
     key: str
 
 
+class ProteinColumns:
+    def __init__(
+        self,
+        keys: list[str],
+        seqs: list[str],
+        props: dict[ProteinProp, Sequence[Optional[float]]],
+        lengths: Optional[np.ndarray] = None,
+        matrix: Optional["torch.Tensor"] = None,
+        offsets: Optional[np.ndarray] = None,
+        reader: Optional["HDF5RepresentationReader"] = None,
+        locations: Optional[list["RepresentationLocation"]] = None,
+    ):
+        # one entry per protein in every column; props are float arrays where NaN marks a null
+        self._keys = keys
+        self._seqs = seqs
+        if lengths is None:
+            lengths = np.fromiter((len(seq) for seq in seqs), dtype=np.int64, count=len(seqs))
+        self._lengths = lengths.astype(np.int64)
+        self._props = {name: self._to_nullable_array(props[name]) for name in protein_props}
+        self._nulls = {name: np.isnan(values) for name, values in self._props.items()}
+        self._key_index: Optional[dict[str, int]] = None
+
+        # representations are served from the first available of: a tensor set on the row, the row's range
+        # of one shared residue matrix, or a lazy read through the reader
+        self._representations: list[Optional["torch.Tensor"]] = [None] * len(keys)
+        self._piped: list[Optional["torch.Tensor"]] = [None] * len(keys)
+        self._matrix = matrix
+        self._offsets = offsets
+        self._reader = reader
+        self._locations = locations
+        self._released = np.zeros(len(keys), dtype=np.bool_)
+        # kept alongside _released, so that release does not scan every row
+        self._released_count = 0
+
+    def __len__(self):
+        return len(self._keys)
+
+    @property
+    def keys(self):
+        return self._keys
+
+    @property
+    def seqs(self):
+        return self._seqs
+
+    @property
+    def lengths(self):
+        return self._lengths
+
+    @staticmethod
+    def _to_nullable_array(values: Sequence[Optional[float]]) -> np.ndarray:
+        if isinstance(values, np.ndarray):
+            return values.astype(np.float64)
+
+        return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+
+    @classmethod
+    def from_sources(
+        cls,
+        sources: list[ProteinSource],
+        reader: Optional["HDF5RepresentationReader"] = None,
+        locations: Optional[list["RepresentationLocation"]] = None,
+    ):
+        columns = ProteinColumns(
+            keys=[source["key"] for source in sources],
+            seqs=[source["raw"]["seq"] for source in sources],
+            # props missing from a source are stored as null
+            props={name: [source["props"].get(name) for source in sources] for name in protein_props},
+            reader=reader,
+            locations=locations,
+        )
+        for row, source in enumerate(sources):
+            columns._representations[row] = source["raw"]["representations"]
+            columns._piped[row] = source["raw"]["piped"]
+
+        return columns
+
+    @classmethod
+    def concat(cls, parts: list[tuple["ProteinColumns", np.ndarray]]):
+        # rows are copied out of each part; tensors are shared, not copied
+        columns = ProteinColumns(
+            keys=[part._keys[row] for part, rows in parts for row in rows.tolist()],
+            seqs=[part._seqs[row] for part, rows in parts for row in rows.tolist()],
+            props={name: np.concatenate([part._props[name][rows] for part, rows in parts]) for name in protein_props},
+        )
+        # lazy rows stay lazy when every part reads from the same file, and are read now otherwise
+        readers = {id(part._reader): part._reader for part, _ in parts if part._reader is not None}
+        if len(readers) == 1:
+            columns._reader = next(iter(readers.values()))
+            columns._locations = []
+
+        row = 0
+        for part, rows in parts:
+            lazy = columns._reader is not None and part._reader is columns._reader
+            for part_row in rows.tolist():
+                if columns._locations is not None:
+                    columns._locations.append(part._locations[part_row] if lazy and part._locations else None)
+                if lazy:
+                    columns._representations[row] = part._set_or_matrix_representations(part_row)
+                else:
+                    columns._representations[row] = part._find_representations(part_row)
+                columns._piped[row] = part._piped[part_row]
+                columns._released[row] = part._released[part_row]
+                row += 1
+        columns._released_count = int(columns._released.sum())
+
+        return columns
+
+    def row_of(self, key: str) -> Optional[int]:
+        if self._key_index is None:
+            self._key_index = {key: row for row, key in enumerate(self._keys)}
+
+        return self._key_index.get(key)
+
+    def read_props(self, row: int, name: ProteinProp):
+        if self._nulls[name][row]:
+            raise ProteinPropsUnreadableException(name=name)
+
+        value = self._props[name][row].item()
+        return int(value) if name == "length" else value
+
+    def read_props_matrix(self, rows: np.ndarray, names: list[ProteinProp]) -> np.ndarray:
+        for name in names:
+            if self._nulls[name][rows].any():
+                raise ProteinPropsUnreadableException(name=name)
+
+        matrix = np.empty((len(rows), len(names)), dtype=np.float64)
+        for i, name in enumerate(names):
+            matrix[:, i] = self._props[name][rows]
+
+        return matrix
+
+    def read_nullable_props(self, rows: np.ndarray, name: ProteinProp) -> list[Optional[float]]:
+        values = self._props[name][rows].tolist()
+        nulls = self._nulls[name][rows].tolist()
+        return [None if null else value for value, null in zip(values, nulls)]
+
+    def props(self, row: int) -> ProteinProps:
+        values = {name: None if self._nulls[name][row] else self._props[name][row].item() for name in protein_props}
+        return {
+            "ccs": values["ccs"],
+            "rt": values["rt"],
+            "mass": values["mass"],
+            "charge": values["charge"],
+            "length": None if values["length"] is None else int(values["length"]),
+            "half_time": values["half_time"],
+        }
+
+    def set_props(self, row: int, props: ProteinProps):
+        for name in protein_props:
+            value = props[name]
+            self._props[name][row] = np.nan if value is None else value
+            self._nulls[name][row] = value is None
+
+    def _set_or_matrix_representations(self, row: int) -> Optional["torch.Tensor"]:
+        representations = self._representations[row]
+        if representations is not None or self._released[row]:
+            return representations
+
+        if self._matrix is not None and self._offsets is not None:
+            return self._matrix[self._offsets[row] : self._offsets[row + 1]]  # noqa: E203
+
+        return None
+
+    def matrix_rows(self, rows: np.ndarray) -> Optional[tuple["torch.Tensor", np.ndarray]]:
+        # the shared residue matrix and the start of each row in it, when every row is still served from it
+        if self._matrix is None or self._offsets is None or self._released[rows].any():
+            return None
+        if any(self._representations[row] is not None for row in rows.tolist()):
+            return None
+
+        return self._matrix, self._offsets[rows]
+
+    def _find_representations(self, row: int) -> Optional["torch.Tensor"]:
+        representations = self._set_or_matrix_representations(row)
+        if representations is not None or self._released[row]:
+            return representations
+
+        if self._reader is not None and self._locations is not None and self._locations[row] is not None:
+            return self._reader.read(location=self._locations[row])
+
+        return None
+
+    def representations(self, row: int):
+        representations = self._find_representations(row)
+        if representations is None:
+            raise ProteinRepresentationsUnavailableException()
+
+        return representations
+
+    def set_representations(self, row: int, representations: "torch.Tensor"):
+        self._representations[row] = representations
+        if self._released[row]:
+            self._released[row] = False
+            self._released_count -= 1
+
+    def piped(self, row: int):
+        piped = self._piped[row]
+        if piped is None:
+            raise ProteinPipedUnavailableException()
+
+        return piped
+
+    def set_piped(self, row: int, piped: "torch.Tensor"):
+        self._piped[row] = piped
+
+    def release(self, row: int):
+        self._representations[row] = None
+        self._piped[row] = None
+        if not self._released[row]:
+            self._released[row] = True
+            self._released_count += 1
+
+        # the shared matrix is only freed once no row is served from it any more
+        if self._matrix is not None and self._released_count == len(self._keys):
+            self._matrix = None
+
+    def close(self):
+        if self._reader is not None:
+            self._reader.close()
+
+
 class Protein:
+    # a view of one row of ProteinColumns; views are created on demand and hold no data of their own
+    __slots__ = ("_columns", "_row")
+
     def __init__(self, source: ProteinSource):
-        self._source = source
+        self._columns = ProteinColumns.from_sources(sources=[source])
+        self._row = 0
+
+    @classmethod
+    def view(cls, columns: ProteinColumns, row: int):
+        protein = cls.__new__(cls)
+        protein._columns = columns
+        protein._row = row
+        return protein
+
+    @property
+    def columns(self):
+        return self._columns
+
+    @property
+    def row(self):
+        return self._row
 
     @property
     def seq(self):
-        return self._source["raw"]["seq"]
+        return self._columns.seqs[self._row]
 
     @property
     def key(self):
-        return self._source["key"]
+        return self._columns.keys[self._row]
 
     @property
     def props(self):
-        return self._source["props"]
+        return self._columns.props(self._row)
 
     @property
     def length(self):
-        return len(self._source["raw"]["seq"])
+        return int(self._columns.lengths[self._row])
 
     def read_props(self, name: ProteinPropName):
-        prop = self._source["props"][name]
-        if prop is None:
-            raise ProteinPropsUnreadableException(name=name)
-
-        return prop
+        return self._columns.read_props(self._row, name)
 
     def set_props(self, props: ProteinProps):
-        self._source["props"] = props
+        self._columns.set_props(self._row, props)
         return self
 
     @property
     def representations(self):
-        representations = self._source["raw"]["representations"]
-        if representations is None:
-            raise ProteinRepresentationsUnavailableException()
-
-        return representations
+        return self._columns.representations(self._row)
 
-    def set_representations(self, representations: torch.Tensor):
-        self._source["raw"]["representations"] = representations
+    def set_representations(self, representations: "torch.Tensor"):
+        self._columns.set_representations(self._row, representations)
         return self
 
     @property
     def piped(self):
-        piped = self._source["raw"]["piped"]
-        if piped is None:
-            raise ProteinPipedUnavailableException()
+        return self._columns.piped(self._row)
 
-        return piped
+    def set_piped(self, piped: "torch.Tensor"):
+        self._columns.set_piped(self._row, piped)
+        return self
 
-    def set_piped(self, piped: torch.Tensor):
-        self._source["raw"]["piped"] = piped
+    def release(self):
+        self._columns.release(self._row)
         return self
@@ -1,136 +1,515 @@
+import os
 import random
-from typing import Literal
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Iterator, Literal, Optional
 
 import h5py
-import polars as pl
+import numpy as np
 import torch
-from tqdm import tqdm
+
+# registers the shared memory pickling of tensors returned by worker processes
+import torch.multiprocessing  # noqa: F401
 
 from src.lib.utils.utils import Utils
 from src.modules.data.hdf.hdf5 import HDF5
-from src.modules.protein.protein import Protein, ProteinProps, ProteinRaw, ProteinSource
+from src.modules.data.hdf.representation_store import RepresentationStore
+from src.modules.protein.exceptions import ProteinRepresentationsMissingException
+from src.modules.protein.lazy_protein import HDF5RepresentationReader, RepresentationLocation
+from src.modules.protein.protein import (  # noqa: F401
+    Protein,
+    ProteinColumns,
+    ProteinProp,
+    ProteinProps,
+    ProteinRaw,
+    ProteinSource,
+    protein_props,
+)
+
+if TYPE_CHECKING:
+    import polars as pl
 
 ProteinLanguageName = Literal["esm2", "esm1b"]
 protein_language_names: list[ProteinLanguageName] = ["esm2", "esm1b"]
 
-ProteinProp = Literal["ccs", "rt", "mass", "length", "charge", "half_time"]
+HDF5Compression = Literal["gzip", "lzf"]
+
+
+def _read_hdf5_props(attrs: h5py.AttributeManager) -> ProteinProps:
+    return {
+        "ccs": HDF5.read_nullable_attrs("ccs", attrs),
+        "rt": HDF5.read_nullable_attrs("rt", attrs),
+        "mass": HDF5.read_nullable_attrs("mass", attrs),
+        "length": HDF5.read_nullable_attrs("length", attrs),
+        "charge": HDF5.read_nullable_attrs("charge", attrs),
+        "half_time": HDF5.read_nullable_attrs("half_time", attrs),
+    }
+
+
+def _read_csv_batches(path: str, chunk_size: int) -> Iterator["pl.DataFrame"]:
+    import polars as pl
+
+    reader = pl.read_csv_batched(path, batch_size=chunk_size)
+    while (batches := reader.next_batches(1)) is not None:
+        yield from batches
+
+
+def _read_hdf5_chunk(
+    path: str, proteins_dir: str, keys: list[str]
+) -> tuple[torch.Tensor, list[int], list[tuple[str, ProteinProps]]]:
+    # runs in a worker process with its own read-only handle; the chunk is returned as one tensor,
+    # which torch.multiprocessing moves to shared memory instead of pickling its data
+    representations: list[torch.Tensor] = []
+    metadata: list[tuple[str, ProteinProps]] = []
+    with h5py.File(path, mode="r") as f:
+        for key in keys:
+            data = f[f"{proteins_dir}/{key}"]
+            representations.append(torch.from_numpy(data[:]))
+            metadata.append((data.attrs["seq"], _read_hdf5_props(attrs=data.attrs)))
+
+    offsets = [0]
+    for representation in representations:
+        offsets.append(offsets[-1] + representation.size(0))
+
+    return torch.cat(representations), offsets, metadata
+
+
+def _append_hdf5_rows(dataset: h5py.Dataset, rows: list[np.ndarray]):
+    start = dataset.shape[0]
+    block = np.concatenate(rows)
+    dataset.resize(start + block.shape[0], axis=0)
+    dataset[start:] = block
 
 
 class ProteinList:
     proteins_dir = "proteins"
+    contiguous_dir = "contiguous"
+    referenced_dir = "referenced"
 
     def __init__(self, proteins: list[Protein]):
-        self._proteins = random.sample(proteins, len(proteins))
+        columns, rows = self._gather(proteins=proteins)
+        self._set_rows(columns=columns, rows=rows)
 
     def __len__(self):
-        return len(self._proteins)
+        return len(self._rows)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
 
     @property
     def proteins(self):
-        return self._proteins
+        return [Protein.view(columns=self._columns, row=row) for row in self._rows.tolist()]
+
+    @property
+    def columns(self):
+        return self._columns
+
+    @property
+    def rows(self):
+        return self._rows
+
+    @property
+    def keys(self) -> list[str]:
+        keys = self._columns.keys
+        return [keys[row] for row in self._rows.tolist()]
+
+    @property
+    def lengths(self) -> np.ndarray:
+        return self._columns.lengths[self._rows]
+
+    @property
+    def max_length(self):
+        return int(self.lengths.max())
+
+    def read_props(self, names: list[ProteinProp]) -> np.ndarray:
+        return self._columns.read_props_matrix(rows=self._rows, names=names)
+
+    def read_nullable_props(self, name: ProteinProp) -> list[Optional[float]]:
+        return self._columns.read_nullable_props(rows=self._rows, name=name)
+
+    def _set_rows(self, columns: ProteinColumns, rows: np.ndarray):
+        self._columns = columns
+        self._rows = rows[random.sample(range(len(rows)), len(rows))]
+        return self
+
+    @classmethod
+    def from_columns(self, columns: ProteinColumns, rows: Optional[np.ndarray] = None):
+        protein_list = ProteinList.__new__(ProteinList)
+        return protein_list._set_rows(columns=columns, rows=rows if rows is not None else np.arange(len(columns)))
+
+    @classmethod
+    def _gather(self, proteins: list[Protein]) -> tuple[ProteinColumns, np.ndarray]:
+        rows = np.fromiter((protein.row for protein in proteins), dtype=np.int64, count=len(proteins))
+        if len(proteins) == 0:
+            return ProteinColumns(keys=[], seqs=[], props={name: [] for name in protein_props}), rows
+
+        columns = proteins[0].columns
+        if all(protein.columns is columns for protein in proteins):
+            return columns, rows
+
+        # proteins of different columns are copied into new ones in the given order; the given views are left
+        # on their own columns, so later writes through them are not seen by this list
+        joined = ProteinColumns.concat(parts=[(protein.columns, np.array([protein.row])) for protein in proteins])
+        return joined, np.arange(len(proteins))
 
     @classmethod
     def join(self, protein_lists: list["ProteinList"]):
-        proteins: list[Protein] = []
-        for protein_list in protein_lists:
-            for protein in protein_list.proteins:
-                proteins.append(protein)
+        if len(protein_lists) > 0 and all(
+            protein_list.columns is protein_lists[0].columns for protein_list in protein_lists
+        ):
+            rows = np.concatenate([protein_list.rows for protein_list in protein_lists])
+            return ProteinList.from_columns(columns=protein_lists[0].columns, rows=rows)
 
-        return ProteinList(proteins=proteins)
+        parts = [(protein_list.columns, protein_list.rows) for protein_list in protein_lists]
+        return ProteinList.from_columns(columns=ProteinColumns.concat(parts=parts))
 
     @classmethod
     def from_csv(self, path: str):
-        df = pl.read_csv(path)
-
-        proteins: list[Protein] = []
-        for row in df.iter_rows(named=True):
-            raw: ProteinRaw = {"seq": row["seq"], "representations": None, "piped": None}
-            props: ProteinProps = {
-                "ccs": row.get("ccs"),
-                "rt": row.get("rt"),
-                "mass": row.get("mass"),
-                "charge": row.get("charge"),
-                "length": row.get("length"),
-                "half_time": row.get("half_time"),
+        import polars as pl
+
+        return ProteinList.from_columns(columns=self._columns_from_frame(df=pl.read_csv(path)))
+
+    @classmethod
+    def scan_csv(self, path: str, chunk_size: int = 65536) -> Iterator["ProteinList"]:
+        import polars as pl
+
+        # the file is streamed chunk by chunk, so only one chunk of rows is held at a time;
+        # collect_batches streams the lazy scan on newer polars, older ones only have the batched reader
+        if hasattr(pl.LazyFrame, "collect_batches"):
+            frames = pl.scan_csv(path).collect_batches(chunk_size=chunk_size)
+        else:
+            frames = _read_csv_batches(path=path, chunk_size=chunk_size)
+
+        for df in frames:
+            yield ProteinList.from_columns(columns=self._columns_from_frame(df=df))
+
+    @classmethod
+    def _columns_from_frame(self, df: "pl.DataFrame"):
+        import polars as pl
+
+        # whole columns are taken out at once; missing prop columns are all null
+        props = {
+            name: df[name].cast(pl.Float64).to_numpy() if name in df.columns else np.full(len(df), np.nan)
+            for name in protein_props
+        }
+        return ProteinColumns(
+            keys=df["index"].to_list(),
+            seqs=df["seq"].to_list(),
+            props=props,
+            lengths=df["seq"].str.len_chars().to_numpy(),
+        )
+
+    @classmethod
+    def from_hdf5(self, path: str):
+        with h5py.File(path, mode="r") as f:
+            return self._from_hdf5_file(f=f)
+
+    def close(self):
+        # closes the file of a lazy list, which every list sharing its columns reads through
+        self._columns.close()
+
+    @classmethod
+    def from_hdf5_lazy(self, path: str, max_bytes: int = 2**30):
+        # representations are read on first access through a shared open file, keeping at most max_bytes resident;
+        # the file stays open until close, or the end of a with block
+        reader = HDF5RepresentationReader(path=path, max_bytes=max_bytes)
+        return self._from_hdf5_file(f=reader.file, reader=reader)
+
+    @classmethod
+    def from_hdf5_parallel(self, path: str, workers: int, chunk_size: int = 1024):
+        with h5py.File(path, mode="r") as f:
+            if self.contiguous_dir in f:
+                # already read in bulk, so there is nothing to split
+                return self._from_hdf5_file(f=f)
+
+            keys: list[str] = list(f[self.proteins_dir].keys())
+
+        from tqdm import tqdm
+
+        chunks = [keys[i : i + chunk_size] for i in range(0, len(keys), chunk_size)]  # noqa: E203
+
+        sources: list[ProteinSource] = []
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(_read_hdf5_chunk, [path] * len(chunks), [self.proteins_dir] * len(chunks), chunks)
+            for chunk, (representations, offsets, metadata) in zip(chunks, tqdm(results, total=len(chunks))):
+                for i, (seq, props) in enumerate(metadata):
+                    raw: ProteinRaw = {
+                        "seq": seq,
+                        "representations": representations[offsets[i] : offsets[i + 1]],  # noqa: E203
+                        "piped": None,
+                    }
+                    sources.append({"raw": raw, "props": props, "key": chunk[i]})
+
+        return ProteinList.from_columns(columns=ProteinColumns.from_sources(sources=sources))
+
+    @classmethod
+    def _from_hdf5_file(self, f: h5py.File, reader: Optional[HDF5RepresentationReader] = None):
+        if self.contiguous_dir in f:
+            return self._from_contiguous_group(group=f[self.contiguous_dir], reader=reader)
+
+        if self.referenced_dir in f:
+            return self._from_referenced_group(group=f[self.referenced_dir])
+
+        from tqdm import tqdm
+
+        keys = f["proteins"].keys()
+
+        sources: list[ProteinSource] = []
+        locations: list[RepresentationLocation] = []
+        for key in tqdm(keys):
+            name = f"{self.proteins_dir}/{key}"
+            data = f[name]
+            attrs = data.attrs
+
+            raw: ProteinRaw = {
+                "seq": attrs["seq"],
+                "representations": torch.Tensor(data[:]) if reader is None else None,
+                "piped": None,
             }
+            props = _read_hdf5_props(attrs=attrs)
+
             source: ProteinSource = {
                 "raw": raw,
                 "props": props,
-                "key": row["index"],
+                "key": key,
             }
-            protein = Protein(source=source)
-            proteins.append(protein)
+            sources.append(source)
+            locations.append((name, None, None))
 
-        return ProteinList(proteins=proteins)
+        columns = ProteinColumns.from_sources(
+            sources=sources, reader=reader, locations=locations if reader is not None else None
+        )
+        return ProteinList.from_columns(columns=columns)
 
     @classmethod
-    def from_hdf5(self, path: str):
-        with h5py.File(path, mode="r") as f:
-            keys = f["proteins"].keys()
-
-            proteins: list[Protein] = []
-            for key in tqdm(keys):
-                data = f[f"{self.proteins_dir}/{key}"]
-                attrs = data.attrs
-
-                raw: ProteinRaw = {"seq": attrs["seq"], "representations": torch.Tensor(data[:]), "piped": None}
-                props: ProteinProps = {
-                    "ccs": HDF5.read_nullable_attrs("ccs", attrs),
-                    "rt": HDF5.read_nullable_attrs("rt", attrs),
-                    "mass": HDF5.read_nullable_attrs("mass", attrs),
-                    "length": HDF5.read_nullable_attrs("length", attrs),
-                    "charge": HDF5.read_nullable_attrs("charge", attrs),
-                    "half_time": HDF5.read_nullable_attrs("half_time", attrs),
-                }
-
-                source: ProteinSource = {
-                    "raw": raw,
-                    "props": props,
-                    "key": key,
-                }
-
-                protein = Protein(source=source)
-                proteins.append(protein)
-
-        return ProteinList(proteins=proteins)
+    def _from_contiguous_group(self, group: h5py.Group, reader: Optional[HDF5RepresentationReader] = None):
+        # one bulk read per dataset; rows are served as views into the shared residue matrix
+        dataset_name = f"{self.contiguous_dir}/representations"
+        offsets: np.ndarray = group["offsets"][:]
+        keys: list[str] = group["keys"].asstr()[:].tolist()
+        columns = ProteinColumns(
+            keys=keys,
+            seqs=group["seqs"].asstr()[:].tolist(),
+            props={name: HDF5.read_nullable_column(name, group["props"]) for name in protein_props},
+            matrix=torch.from_numpy(group["representations"][:]) if reader is None else None,
+            offsets=offsets,
+            reader=reader,
+            locations=[(dataset_name, int(offsets[i]), int(offsets[i + 1])) for i in range(len(keys))]
+            if reader is not None
+            else None,
+        )
+
+        return ProteinList.from_columns(columns=columns)
+
+    @classmethod
+    def _from_referenced_group(self, group: h5py.Group):
+        store = RepresentationStore(path=group.attrs["store_path"])
+        digests: list[str] = group["digests"].asstr()[:].tolist()
+        stored = store.read_digests(digests=digests)
+        keys = group["keys"].asstr()[:].tolist()
+        # a store that lost entries since the file was saved fails here rather than on first access
+        missing = [row for row, digest in enumerate(digests) if digest not in stored]
+        if len(missing) > 0:
+            raise ProteinRepresentationsMissingException(
+                store_path=store.path, keys=[keys[row] for row in missing], digests=[digests[row] for row in missing]
+            )
+
+        columns = ProteinColumns(
+            keys=keys,
+            seqs=group["seqs"].asstr()[:].tolist(),
+            props={name: HDF5.read_nullable_column(name, group["props"]) for name in protein_props},
+        )
+        for row, digest in enumerate(digests):
+            columns.set_representations(row, stored[digest])
+
+        return ProteinList.from_columns(columns=columns)
+
+    def save_as_referenced_hdf5(self, path: str, store: RepresentationStore, language_name: str):
+        # only digests are written here; the representations live once in the shared store
+        store.write(
+            language_name=language_name,
+            representations={protein.seq: protein.representations for protein in self.proteins},
+        )
+        digests = [store.digest(language_name=language_name, seq=protein.seq) for protein in self.proteins]
+
+        with h5py.File(name=path, mode="w") as f:
+            group = f.create_group(self.referenced_dir)
+            group.attrs["store_path"] = os.path.abspath(store.path)
+            group.attrs["language_name"] = language_name
+            group.create_dataset("digests", data=digests, dtype=h5py.string_dtype())
+            group.create_dataset(
+                "keys", data=[str(protein.key) for protein in self.proteins], dtype=h5py.string_dtype()
+            )
+            group.create_dataset("seqs", data=[protein.seq for protein in self.proteins], dtype=h5py.string_dtype())
+
+            props_group = group.create_group("props")
+            for name in protein_props:
+                HDF5.create_nullable_column(name, self.read_nullable_props(name), props_group)
+
+    def save_as_contiguous_hdf5(self, path: str, compression: Optional[HDF5Compression] = None, chunk_rows: int = 4096):
+        representations = [protein.representations for protein in self.proteins]
+        offsets = np.zeros(len(representations) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([representation.size(0) for representation in representations])
+        total = int(offsets[-1])
+        dim = representations[0].size(1) if len(representations) > 0 else 0
+
+        with h5py.File(name=path, mode="w") as f:
+            group = f.create_group(self.contiguous_dir)
+            dataset = group.create_dataset(
+                "representations",
+                shape=(total, dim),
+                dtype="float32",
+                chunks=(min(chunk_rows, total), dim) if total > 0 and dim > 0 else None,
+                compression=compression,
+            )
+
+            # written a chunk of proteins at a time instead of one small write per protein
+            start = 0
+            while start < len(representations):
+                stop = int(np.searchsorted(offsets, offsets[start] + chunk_rows, side="right")) - 1
+                stop = max(stop, start + 1)
+                rows = torch.cat(representations[start:stop]).numpy()
+                dataset[offsets[start] : offsets[stop]] = rows  # noqa: E203
+                start = stop
+
+            group.create_dataset("offsets", data=offsets)
+            group.create_dataset(
+                "keys", data=[str(protein.key) for protein in self.proteins], dtype=h5py.string_dtype()
+            )
+            group.create_dataset("seqs", data=[protein.seq for protein in self.proteins], dtype=h5py.string_dtype())
+
+            props_group = group.create_group("props")
+            for name in protein_props:
+                HDF5.create_nullable_column(name, self.read_nullable_props(name), props_group)
+
+    @classmethod
+    def convert_hdf5_to_contiguous(
+        self, source_path: str, path: str, compression: Optional[HDF5Compression] = None, chunk_rows: int = 4096
+    ):
+        # streamed through a chunk of rows at a time, so the legacy file is never held in memory as a whole
+        keys: list[str] = []
+        seqs: list[str] = []
+        props: dict[ProteinProp, list[Optional[float]]] = {name: [] for name in protein_props}
+        offsets = [0]
+
+        with h5py.File(source_path, mode="r") as source, h5py.File(name=path, mode="w") as f:
+            group = f.create_group(self.contiguous_dir)
+            dataset: Optional[h5py.Dataset] = None
+            pending: list[np.ndarray] = []
+            for key in source[self.proteins_dir].keys():
+                data = source[f"{self.proteins_dir}/{key}"]
+                representations: np.ndarray = data[:]
+                if dataset is None:
+                    dim = representations.shape[1]
+                    dataset = group.create_dataset(
+                        "representations",
+                        shape=(0, dim),
+                        maxshape=(None, dim),
+                        dtype="float32",
+                        chunks=(chunk_rows, dim),
+                        compression=compression,
+                    )
+
+                keys.append(key)
+                seqs.append(data.attrs["seq"])
+                for name, value in _read_hdf5_props(attrs=data.attrs).items():
+                    props[name].append(value)
+                offsets.append(offsets[-1] + representations.shape[0])
+
+                pending.append(representations)
+                if offsets[-1] - dataset.shape[0] >= chunk_rows:
+                    _append_hdf5_rows(dataset=dataset, rows=pending)
+                    pending = []
+
+            if dataset is None:
+                group.create_dataset("representations", shape=(0, 0), dtype="float32")
+            elif len(pending) > 0:
+                _append_hdf5_rows(dataset=dataset, rows=pending)
+
+            group.create_dataset("offsets", data=np.array(offsets, dtype=np.int64))
+            group.create_dataset("keys", data=keys, dtype=h5py.string_dtype())
+            group.create_dataset("seqs", data=seqs, dtype=h5py.string_dtype())
+
+            props_group = group.create_group("props")
+            for name in protein_props:
+                HDF5.create_nullable_column(name, props[name], props_group)
 
     def save_as_hdf5(self, path: str):
         with h5py.File(name=path, mode="w") as f:
             f.create_group(self.proteins_dir)
             for protein in self.proteins:
-                dataset = f.create_dataset(f"{self.proteins_dir}/{protein.key}", data=protein.representations)
-                attrs = dataset.attrs
+                self.write_hdf5_protein(f=f, protein=protein)
+
+    @classmethod
+    def write_hdf5_protein(self, f: h5py.File, protein: Protein):
+        dataset = f.create_dataset(f"{self.proteins_dir}/{protein.key}", data=protein.representations)
+        attrs = dataset.attrs
 
-                attrs["seq"] = protein.seq
+        attrs["seq"] = protein.seq
 
-                HDF5.set_nullable_attrs("length", protein.props["length"], attrs)
-                HDF5.set_nullable_attrs("rt", protein.props["rt"], attrs)
-                HDF5.set_nullable_attrs("ccs", protein.props["ccs"], attrs)
-                HDF5.set_nullable_attrs("mass", protein.props["mass"], attrs)
-                HDF5.set_nullable_attrs("charge", protein.props["charge"], attrs)
-                HDF5.set_nullable_attrs("half_time", protein.props["half_time"], attrs)
+        props = protein.props
+        HDF5.set_nullable_attrs("length", props["length"], attrs)
+        HDF5.set_nullable_attrs("rt", props["rt"], attrs)
+        HDF5.set_nullable_attrs("ccs", props["ccs"], attrs)
+        HDF5.set_nullable_attrs("mass", props["mass"], attrs)
+        HDF5.set_nullable_attrs("charge", props["charge"], attrs)
+        HDF5.set_nullable_attrs("half_time", props["half_time"], attrs)
 
     def find_by_key(self, key: str):
-        for protein in self._proteins:
-            if protein.key == key:
-                return protein
+        row = self._columns.row_of(key)
+        if row is None or not np.any(self._rows == row):
+            return None
 
-        return None
+        return Protein.view(columns=self._columns, row=row)
 
     def set_proteins(self, proteins: list[Protein]):
-        self._proteins = proteins
+        self._columns, self._rows = self._gather(proteins=proteins)
         return self
 
     def rational_split(self, ratios: list[float]):
         return [
-            ProteinList(proteins=proteins) for proteins in Utils.rational_split(target=self._proteins, ratios=ratios)
+            ProteinList.from_columns(columns=self._columns, rows=rows)
+            for rows in Utils.rational_split(target=self._rows, ratios=ratios)
         ]
 
     def even_split(self, unit_size: int):
         return [
-            ProteinList(proteins=proteins) for proteins in Utils.even_split(target=self._proteins, unit_size=unit_size)
+            ProteinList.from_columns(columns=self._columns, rows=rows)
+            for rows in Utils.even_split(target=self._rows, unit_size=unit_size)
         ]
 
+    def take(self, positions: np.ndarray):
+        # the proteins at the given positions of this list, kept in the given order
+        protein_list = ProteinList.__new__(ProteinList)
+        protein_list._columns = self._columns
+        protein_list._rows = self._rows[positions]
+        return protein_list
+
+    def token_split(self, max_tokens: int):
+        # sorted by length so that each batch pads to a length close to all of its members
+        order = np.argsort(self.lengths, kind="stable")
+        rows = self._rows[order].tolist()
+        lengths = self.lengths[order].tolist()
+
+        batches: list[list[int]] = []
+        batch: list[int] = []
+        for row, length in zip(rows, lengths):
+            # the batch is padded to its longest member, which is the current protein, plus the BOS and EOS tokens
+            tokens = length + 2
+            if len(batch) > 0 and (len(batch) + 1) * tokens > max_tokens:
+                batches.append(batch)
+                batch = []
+            batch.append(row)
+
+        if len(batch) > 0:
+            batches.append(batch)
+
+        return [ProteinList.from_columns(columns=self._columns, rows=np.array(batch)) for batch in batches]
+
     def shuffle(self):
-        random.shuffle(self._proteins)
+        rows = self._rows.tolist()
+        random.shuffle(rows)
+        self._rows = np.array(rows, dtype=np.int64)
         return self
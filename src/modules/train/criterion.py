@@ -1,6 +1,5 @@
 import numpy as np
 import torch
-from scipy import stats
 
 from src.modules.train.types import Criteria
 
@@ -23,6 +22,8 @@ class Criterion:
         return loss
 
     def pearsonr(self, output: torch.Tensor, label: torch.Tensor) -> np.float32:
+        from scipy import stats
+
         correlation = stats.pearsonr(output.detach(), label.detach()).correlation
         return correlation
 
@@ -1,102 +1,169 @@
 from typing import Optional
 
+import numpy as np
+
 from src.lib.config.Env import Env
+from src.modules.protein.protein import ProteinProp
 from src.modules.train.types import (
+    Criteria,
+    EpochPrediction,
     EpochResult,
     TrainRecorderMaxAccuracyResult,
-    TrainRecorderResult,
     TrainRecorderResultKey,
+    criteria_names,
+    train_recorder_result_keys,
 )
 
 
 class TrainRecorder:
-    def __init__(self):
+    def __init__(self, prop_names: list[ProteinProp], output_stride: Optional[int] = None):
         self._current_epoch = 1
         self._max_accuracy_epoch: Optional[int] = None
+        self._max_accuracy = 0.0
 
-        self._result: TrainRecorderResult = {
-            "train": {},
-            "evaluate": {},
-            "validate": {},
-        }
-        self._max_accuracy_result: TrainRecorderMaxAccuracyResult = {
-            "train": {},
-            "evaluate": {},
-            "validate": {},
+        self._prop_names = prop_names
+        # per-sample outputs and labels are kept every output_stride epochs, and always for the max accuracy epoch
+        self._output_stride = output_stride
+
+        # one row per recorded epoch, grown by doubling
+        self._size = 0
+        self._epochs = np.empty(0, dtype=np.int64)
+        self._criteria = {
+            key: np.empty((0, len(prop_names), len(criteria_names))) for key in train_recorder_result_keys
         }
+        self._predictions: dict[int, dict[TrainRecorderResultKey, EpochPrediction]] = {}
 
     @property
     def train_result(self):
-        return self._result["train"]
+        return self._result(key="train")
 
     @property
     def validate_result(self):
-        return self._result["validate"]
+        return self._result(key="validate")
 
     @property
     def evaluate_result(self):
-        return self._result["evaluate"]
+        return self._result(key="evaluate")
 
     @property
     def current_epoch(self):
         return self._current_epoch
 
     @property
-    def max_accuracy_result(self):
-        return self._max_accuracy_result
+    def max_accuracy_result(self) -> TrainRecorderMaxAccuracyResult:
+        if self._max_accuracy_epoch is None:
+            return {key: {} for key in train_recorder_result_keys}
+
+        row = self._row_of(self._max_accuracy_epoch)
+        return {
+            key: {prop_name: self._epoch_result(key=key, row=row, i=i) for i, prop_name in enumerate(self._prop_names)}
+            for key in train_recorder_result_keys
+        }
 
     @property
     def max_accuracy_epoch(self):
         return self._max_accuracy_epoch
 
-    def _set_max_accuracy_result(self, key: TrainRecorderResultKey, epoch_results: list[EpochResult]):
-        for result in epoch_results:
-            prop_name = result["prop_name"]
-            self._max_accuracy_result[key][prop_name] = result
-
-    def _append_result(self, key: TrainRecorderResultKey, epoch_results: list[EpochResult]):
-        for result in epoch_results:
-            prop_name = result["prop_name"]
-            results = self._result[key].get(prop_name)
-            if results is None:
-                self._result[key][prop_name] = [result]
-            else:
-                self._result[key][prop_name].append(result)
-
-    def is_max_accuracy(self, epoch_results: list[EpochResult]):
-        if self._max_accuracy_result is None:
-            return True
+    def max_accuracy_criteria(self, key: TrainRecorderResultKey) -> dict[ProteinProp, Criteria]:
+        # the criteria alone, without building the per-sample lists of max_accuracy_result
+        if self._max_accuracy_epoch is None:
+            return {}
+
+        row = self._row_of(self._max_accuracy_epoch)
+        return {prop_name: self._criteria_of(key=key, row=row, i=i) for i, prop_name in enumerate(self._prop_names)}
+
+    def _row_of(self, epoch: int) -> int:
+        return int(np.searchsorted(self._epochs[: self._size], epoch))
+
+    def _reserve(self, size: int):
+        if size <= len(self._epochs):
+            return
+
+        capacity = max(size, 2 * len(self._epochs), 16)
+        epochs = np.empty(capacity, dtype=np.int64)
+        epochs[: self._size] = self._epochs[: self._size]
+        self._epochs = epochs
+        for key, criteria in self._criteria.items():
+            grown = np.empty((capacity, *criteria.shape[1:]))
+            grown[: self._size] = criteria[: self._size]
+            self._criteria[key] = grown
+
+    def _criteria_of(self, key: TrainRecorderResultKey, row: int, i: int) -> Criteria:
+        values = self._criteria[key][row, i].tolist()
+        return {
+            "root_mean_squared_error": values[0],
+            "mean_squared_error": values[1],
+            "mean_absolute_error": values[2],
+            "pearsonr": values[3],
+        }
+
+    def _epoch_result(self, key: TrainRecorderResultKey, row: int, i: int) -> EpochResult:
+        # epochs whose per-sample outputs were not kept have empty output and label lists
+        epoch = int(self._epochs[row])
+        prediction = self._predictions.get(epoch, {}).get(key)
+        return {
+            "prop_name": self._prop_names[i],
+            "epoch": epoch,
+            "output": prediction["output"][:, i].tolist() if prediction is not None else [],
+            "label": prediction["label"][:, i].tolist() if prediction is not None else [],
+            "criteria": self._criteria_of(key=key, row=row, i=i),
+        }
 
-        pearsonrs = map(lambda result: result["criteria"]["pearsonr"], epoch_results)
-        accuracy = sum(pearsonrs)
+    def _result(self, key: TrainRecorderResultKey) -> dict[ProteinProp, list[EpochResult]]:
+        return {
+            prop_name: [self._epoch_result(key=key, row=row, i=i) for row in range(self._size)]
+            for i, prop_name in enumerate(self._prop_names)
+        }
 
-        max_accuracy_validate_result = self._max_accuracy_result["validate"]
-        max_accuracy_pearsonrs = map(
-            lambda result: result["criteria"]["pearsonr"], max_accuracy_validate_result.values()
-        )
-        max_accuracy = sum(max_accuracy_pearsonrs)
+    def is_max_accuracy(self, epoch_prediction: EpochPrediction):
+        accuracy = sum(criteria["pearsonr"] for criteria in epoch_prediction["criteria"])
+        return accuracy > self._max_accuracy
 
-        return accuracy > max_accuracy
+    def _is_strided(self, epoch: int):
+        return self._output_stride is not None and epoch % self._output_stride == 0
 
     def next_epoch(self):
         self._current_epoch += 1
 
     def append_results(
         self,
-        train_epoch_results: list[EpochResult],
-        validate_epoch_results: list[EpochResult],
-        evaluate_epoch_results: list[EpochResult],
+        train_epoch_prediction: EpochPrediction,
+        validate_epoch_prediction: EpochPrediction,
+        evaluate_epoch_prediction: EpochPrediction,
     ):
-        self._append_result(key="train", epoch_results=train_epoch_results)
-        self._append_result(key="validate", epoch_results=validate_epoch_results)
-        self._append_result(key="evaluate", epoch_results=evaluate_epoch_results)
-
-        if self.is_max_accuracy(epoch_results=validate_epoch_results):
-            self._set_max_accuracy_result(key="train", epoch_results=train_epoch_results)
-            self._set_max_accuracy_result(key="validate", epoch_results=validate_epoch_results)
-            self._set_max_accuracy_result(key="evaluate", epoch_results=evaluate_epoch_results)
+        predictions: dict[TrainRecorderResultKey, EpochPrediction] = {
+            "train": train_epoch_prediction,
+            "validate": validate_epoch_prediction,
+            "evaluate": evaluate_epoch_prediction,
+        }
+
+        self._reserve(self._size + 1)
+        self._epochs[self._size] = self._current_epoch
+        for key, prediction in predictions.items():
+            self._criteria[key][self._size] = [
+                [criteria[name] for name in criteria_names] for criteria in prediction["criteria"]
+            ]
+        self._size += 1
+
+        is_max_accuracy = self.is_max_accuracy(epoch_prediction=validate_epoch_prediction)
+        if is_max_accuracy:
+            # the former max accuracy epoch only keeps its outputs when it falls on the stride
+            if self._max_accuracy_epoch is not None and not self._is_strided(self._max_accuracy_epoch):
+                self._predictions.pop(self._max_accuracy_epoch, None)
+
+            self._max_accuracy = sum(criteria["pearsonr"] for criteria in validate_epoch_prediction["criteria"])
             self._max_accuracy_epoch = self._current_epoch
 
+        if is_max_accuracy or self._is_strided(self._current_epoch):
+            self._predictions[self._current_epoch] = {
+                key: {
+                    "output": np.asarray(prediction["output"], dtype=np.float32),
+                    "label": np.asarray(prediction["label"], dtype=np.float32),
+                    "criteria": prediction["criteria"],
+                }
+                for key, prediction in predictions.items()
+            }
+
     def to_continue(self):
         if self._max_accuracy_epoch is None:
             return True
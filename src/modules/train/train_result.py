@@ -1,10 +1,24 @@
+from typing import TYPE_CHECKING, Optional
+
 import h5py
+import numpy as np
+
+from src.modules.train.types import (
+    EpochResult,
+    TrainRecorderMaxAccuracyResult,
+    TrainRecorderResult,
+    TrainResult,
+    train_recorder_result_keys,
+)
 
-from src.modules.train.trainer import Trainer
-from src.modules.train.types import EpochResult, TrainResult
+# only needed for annotations, so that loading results for visualization does not pull in torch
+if TYPE_CHECKING:
+    from src.modules.train.trainer import Trainer
 
 
 class TrainResultLoader:
+    streamed_dir = "streamed"
+
     def __init__(self, train_result: TrainResult):
         self._train_result = train_result
 
@@ -101,14 +115,93 @@ class TrainResultLoader:
         return epoch_result
 
     @classmethod
-    def from_trainer(cls, trainer: Trainer):
+    def from_trainer(cls, trainer: "Trainer"):
         train_result = trainer.as_result()
         return TrainResultLoader(train_result=train_result)
 
+    @classmethod
+    def _load_streamed_epoch_results(
+        cls,
+        group: h5py.Group,
+        prop_names: list[str],
+        criteria_names: list[str],
+        row: int,
+        output: Optional[np.ndarray],
+        label: Optional[np.ndarray],
+    ):
+        epoch = group["epochs"][row].item()
+        criteria = group["criteria"][row]
+
+        epoch_results: list[EpochResult] = []
+        for i, prop_name in enumerate(prop_names):
+            values = dict(zip(criteria_names, criteria[i].tolist()))
+            epoch_result: EpochResult = {
+                "prop_name": prop_name,
+                "epoch": epoch,
+                "label": label[:, i].tolist() if label is not None else [],
+                "output": output[:, i].tolist() if output is not None else [],
+                "criteria": {
+                    "pearsonr": values["pearsonr"],
+                    "mean_squared_error": values["mean_squared_error"],
+                    "root_mean_squared_error": values["root_mean_squared_error"],
+                    "mean_absolute_error": values["mean_absolute_error"],
+                },
+            }
+            epoch_results.append(epoch_result)
+
+        return epoch_results
+
+    @classmethod
+    def _from_streamed_group(cls, group: h5py.Group):
+        input_props = group.attrs["input_props"].tolist()
+        output_props = group.attrs["output_props"].tolist()
+        criteria_names = group.attrs["criteria_names"].tolist()
+        max_accuracy_epoch, slot = group["max_accuracy"][:].tolist()
+
+        # a run still being written may have appended an epoch to some splits only
+        size = min(group[key]["epochs"].shape[0] for key in train_recorder_result_keys)
+        result: TrainRecorderResult = {}
+        max_accuracy_result: TrainRecorderMaxAccuracyResult = {}
+        for key in train_recorder_result_keys:
+            key_group = group[key]
+            output_rows = {epoch: row for row, epoch in enumerate(key_group["output_epochs"][:].tolist())}
+            result[key] = {prop_name: [] for prop_name in output_props}
+            max_accuracy_result[key] = {}
+
+            for row, epoch in enumerate(key_group["epochs"][:size].tolist()):
+                # outputs are kept for the max accuracy epoch and for strided epochs only
+                output, label = None, None
+                if epoch == max_accuracy_epoch:
+                    output, label = key_group["max_accuracy_output"][slot], key_group["max_accuracy_label"][slot]
+                elif epoch in output_rows:
+                    output, label = key_group["output"][output_rows[epoch]], key_group["label"][output_rows[epoch]]
+
+                epoch_results = cls._load_streamed_epoch_results(
+                    key_group, output_props, criteria_names, row=row, output=output, label=label
+                )
+                for epoch_result in epoch_results:
+                    result[key][epoch_result["prop_name"]].append(epoch_result)
+                    if epoch == max_accuracy_epoch:
+                        max_accuracy_result[key][epoch_result["prop_name"]] = epoch_result
+
+        train_result: TrainResult = {
+            "input_props": input_props,
+            "output_props": output_props,
+            "max_accuracy_epoch": max_accuracy_epoch if max_accuracy_epoch >= 0 else None,
+            "max_accuracy_result": max_accuracy_result,
+            "train_result": result,
+        }
+        return TrainResultLoader(train_result=train_result)
+
     @classmethod
     def from_h5(cls, path: str):
+        # opened as a SWMR reader, which also reads files a Trainer is still streaming into or was killed while
+        # streaming; files written in one go read the same way
         print(f"loading {path}...")
-        with h5py.File(path, mode="r") as f:
+        with h5py.File(path, mode="r", swmr=True) as f:
+            if cls.streamed_dir in f:
+                return cls._from_streamed_group(group=f[cls.streamed_dir])
+
             result_group = f["result"]
 
             input_props = result_group.attrs["input_props"]
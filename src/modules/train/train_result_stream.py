@@ -0,0 +1,109 @@
+from typing import Optional
+
+import h5py
+import numpy as np
+
+from src.modules.protein.protein import ProteinProp
+from src.modules.train.train_result import TrainResultLoader
+from src.modules.train.types import EpochPrediction, TrainRecorderResultKey, criteria_names
+
+
+class TrainResultStreamWriter:
+    def __init__(
+        self,
+        path: str,
+        input_props: list[ProteinProp],
+        output_props: list[ProteinProp],
+        output_stride: Optional[int] = None,
+        flush_epochs: int = 1,
+    ):
+        # written in SWMR mode, so that the file stays readable while training runs and after it is killed
+        self._file = h5py.File(path, mode="w", libver="latest")
+        self._input_props = input_props
+        self._output_props = output_props
+        self._output_stride = output_stride
+        self._flush_epochs = flush_epochs
+        self._unflushed_epochs = 0
+        self._group: Optional[h5py.Group] = None
+
+    def _create_group(self, predictions: dict[TrainRecorderResultKey, EpochPrediction]):
+        # SWMR does not allow new datasets or attrs once enabled, so everything is created before the first epoch
+        group = self._file.create_group(TrainResultLoader.streamed_dir)
+        group.attrs["input_props"] = self._input_props
+        group.attrs["output_props"] = self._output_props
+        group.attrs["criteria_names"] = criteria_names
+        # max accuracy epoch and the slot holding its outputs; -1 until there is one
+        group.create_dataset("max_accuracy", data=np.array([-1, 0], dtype=np.int64))
+
+        props = len(self._output_props)
+        for key, prediction in predictions.items():
+            samples = prediction["output"].shape[0]
+            key_group = group.create_group(key)
+            key_group.create_dataset("epochs", shape=(0,), maxshape=(None,), chunks=(1024,), dtype=np.int64)
+            key_group.create_dataset(
+                "criteria",
+                shape=(0, props, len(criteria_names)),
+                maxshape=(None, props, len(criteria_names)),
+                chunks=(1024, props, len(criteria_names)),
+                dtype=np.float64,
+            )
+            key_group.create_dataset("output_epochs", shape=(0,), maxshape=(None,), chunks=(1024,), dtype=np.int64)
+            for name in ["output", "label"]:
+                key_group.create_dataset(
+                    name,
+                    shape=(0, samples, props),
+                    maxshape=(None, samples, props),
+                    chunks=(1, max(samples, 1), props),
+                    dtype=np.float32,
+                )
+                # two slots, so that a new max accuracy epoch never overwrites the outputs the file points at
+                key_group.create_dataset(f"max_accuracy_{name}", shape=(2, samples, props), dtype=np.float32)
+
+        self._file.swmr_mode = True
+        return group
+
+    def _append(self, dataset: h5py.Dataset, value: np.ndarray):
+        dataset.resize(dataset.shape[0] + 1, axis=0)
+        dataset[-1] = value
+
+    def append(
+        self,
+        epoch: int,
+        predictions: dict[TrainRecorderResultKey, EpochPrediction],
+        max_accuracy_epoch: Optional[int],
+    ):
+        if self._group is None:
+            self._group = self._create_group(predictions=predictions)
+
+        is_strided = self._output_stride is not None and epoch % self._output_stride == 0
+        max_accuracy = self._group["max_accuracy"]
+        slot = 1 - int(max_accuracy[1])
+        for key, prediction in predictions.items():
+            key_group = self._group[key]
+            criteria = [[values[name] for name in criteria_names] for values in prediction["criteria"]]
+            # criteria before epochs, so that a reader never sees an epoch without its criteria
+            self._append(key_group["criteria"], np.array(criteria))
+            self._append(key_group["epochs"], np.array(epoch))
+
+            if is_strided:
+                self._append(key_group["output"], prediction["output"])
+                self._append(key_group["label"], prediction["label"])
+                self._append(key_group["output_epochs"], np.array(epoch))
+
+            if max_accuracy_epoch == epoch:
+                key_group["max_accuracy_output"][slot] = prediction["output"]
+                key_group["max_accuracy_label"][slot] = prediction["label"]
+
+        self._unflushed_epochs += 1
+        if max_accuracy_epoch == epoch:
+            # the new slot is flushed before it is pointed at
+            self._file.flush()
+            max_accuracy[:] = [epoch, slot]
+
+        if max_accuracy_epoch == epoch or self._unflushed_epochs >= self._flush_epochs:
+            self._file.flush()
+            self._unflushed_epochs = 0
+
+    def close(self):
+        self._file.flush()
+        self._file.close()
@@ -1,15 +1,18 @@
+from typing import Optional
+
 import torch
 
-from src.modules.dataloader.dataloader import DataBatch, Dataloader
+from src.modules.dataloader.dataloader import Dataloader, UsableDataBatch
 from src.modules.model.configurable_model import ConfigurableModel
 from src.modules.protein.protein_list import ProteinList
 from src.modules.train.criterion import Criterion
 from src.modules.train.train_recorder import TrainRecorder
-from src.modules.train.types import EpochResult, TrainResult
+from src.modules.train.train_result_stream import TrainResultStreamWriter
+from src.modules.train.types import EpochPrediction, TrainResult
 
 
 class Trainer:
-    def __init__(self, model: ConfigurableModel, dataloader: Dataloader):
+    def __init__(self, model: ConfigurableModel, dataloader: Dataloader, output_stride: Optional[int] = None):
         self._model = model
 
         self._dataloader = dataloader
@@ -21,34 +24,30 @@ class Trainer:
         self._model.train()
         self._model.optimizer.train()
 
-        self._recorder = TrainRecorder()
+        self._output_stride = output_stride
+        self._recorder = TrainRecorder(prop_names=self._dataloader.state.output_props, output_stride=output_stride)
 
     @property
     def recorder(self):
         return self._recorder
 
-    def _create_epoch_results(self, label: torch.Tensor, output: torch.Tensor, protein_list: ProteinList):
-        epoch_results: list[EpochResult] = []
-        for i, prop_name in enumerate(self._dataloader.state.output_props):
-            _output = output[:, i]
-            _label = label[:, i]
-
-            criteria = self._criterion(output=_output, label=_label)
-
-            result: EpochResult = {
-                "prop_name": prop_name,
-                "epoch": self._recorder.current_epoch,
-                "output": _output.tolist(),
-                "label": _label.tolist(),
-                "criteria": criteria,
-            }
-            epoch_results.append(result)
-
-        return epoch_results
+    def _create_epoch_prediction(self, label: torch.Tensor, output: torch.Tensor, protein_list: ProteinList):
+        criteria = [
+            self._criterion(output=output[:, i], label=label[:, i])
+            for i in range(len(self._dataloader.state.output_props))
+        ]
+
+        # kept as arrays; the recorder decides which epochs' per-sample values it holds on to
+        epoch_prediction: EpochPrediction = {
+            "output": output.detach().numpy(),
+            "label": label.numpy(),
+            "criteria": criteria,
+        }
+        return epoch_prediction
 
-    def _batch_predict(self, batch: DataBatch, backward: bool = False):
+    def _batch_predict(self, usable: UsableDataBatch, backward: bool = False):
         self._model.optimizer.zero_grad()
-        input, label, protein_list = batch.use()
+        input, label, protein_list = usable
 
         output = self._model(input=input)
         if backward:
@@ -63,9 +62,11 @@ class Trainer:
         batch_outputs: list[torch.Tensor] = []
         batch_protein_lists: list[ProteinList] = []
 
-        for batch in dataloader.batches:
-            _label, _output, _protein_list = self._batch_predict(batch=batch, backward=backward)
-            batch_labels.append(_label)
+        # the next batches are prepared while this one runs through the model when the dataloader prefetches
+        for usable in dataloader.set_epoch(self._recorder.current_epoch).use():
+            _label, _output, _protein_list = self._batch_predict(usable=usable, backward=backward)
+            # labels may live in the dataloader's collation buffers, which the next batch overwrites
+            batch_labels.append(_label.clone())
             batch_outputs.append(_output)
             batch_protein_lists.append(_protein_list)
 
@@ -73,30 +74,58 @@ class Trainer:
         output = torch.cat(batch_outputs)
         protein_list = ProteinList.join(batch_protein_lists)
 
-        epoch_results = self._create_epoch_results(label=label, output=output, protein_list=protein_list)
-        return epoch_results
-
-    def train(self) -> None:
+        return self._create_epoch_prediction(label=label, output=output, protein_list=protein_list)
+
+    def train(self, stream_path: Optional[str] = None, flush_epochs: int = 1) -> None:
+        # every epoch is appended to stream_path as it finishes, so that an interrupted run keeps what it did
+        writer: Optional[TrainResultStreamWriter] = None
+        if stream_path is not None:
+            writer = TrainResultStreamWriter(
+                path=stream_path,
+                input_props=self._dataloader.state.input_props,
+                output_props=self._dataloader.state.output_props,
+                output_stride=self._output_stride,
+                flush_epochs=flush_epochs,
+            )
+
+        try:
+            self._train(writer=writer)
+        finally:
+            if writer is not None:
+                writer.close()
+
+    def _train(self, writer: Optional[TrainResultStreamWriter]):
         while self._recorder.to_continue():
             for i in range(10):
-                train_epoch_results = self._epoch_predict(dataloader=self._train_loader, backward=True)
-                validate_epoch_results = self._epoch_predict(dataloader=self._validate_loader)
-                evaluate_epoch_results = self._epoch_predict(dataloader=self._evaluate_loader)
+                train_epoch_prediction = self._epoch_predict(dataloader=self._train_loader, backward=True)
+                validate_epoch_prediction = self._epoch_predict(dataloader=self._validate_loader)
+                evaluate_epoch_prediction = self._epoch_predict(dataloader=self._evaluate_loader)
 
                 self._recorder.append_results(
-                    train_epoch_results=train_epoch_results,
-                    validate_epoch_results=validate_epoch_results,
-                    evaluate_epoch_results=evaluate_epoch_results,
+                    train_epoch_prediction=train_epoch_prediction,
+                    validate_epoch_prediction=validate_epoch_prediction,
+                    evaluate_epoch_prediction=evaluate_epoch_prediction,
                 )
-
+                if writer is not None:
+                    writer.append(
+                        epoch=self._recorder.current_epoch,
+                        predictions={
+                            "train": train_epoch_prediction,
+                            "validate": validate_epoch_prediction,
+                            "evaluate": evaluate_epoch_prediction,
+                        },
+                        max_accuracy_epoch=self._recorder.max_accuracy_epoch,
+                    )
+
+                output_props = self._dataloader.state.output_props
                 print(f"Current epoch is {self._recorder._current_epoch}")
-                for r in validate_epoch_results:
-                    print(f"Validate {r['prop_name']} pearson: {r['criteria']['pearsonr']}")
-                for r in evaluate_epoch_results:
-                    print(f"Evaluate {r['prop_name']} pearson: {r['criteria']['pearsonr']}")
-                for p, r in self._recorder.max_accuracy_result["evaluate"].items():
+                for p, r in zip(output_props, validate_epoch_prediction["criteria"]):
+                    print(f"Validate {p} pearson: {r['pearsonr']}")
+                for p, r in zip(output_props, evaluate_epoch_prediction["criteria"]):
+                    print(f"Evaluate {p} pearson: {r['pearsonr']}")
+                for p, r in self._recorder.max_accuracy_criteria("evaluate").items():
                     v = self._recorder.max_accuracy_epoch
-                    print(f"Max {p} pearson: {r['criteria']['pearsonr']} at {v}")
+                    print(f"Max {p} pearson: {r['pearsonr']} at {v}")
 
                 self._recorder.next_epoch()
 
@@ -1,9 +1,19 @@
 from typing import Literal, TypedDict
 
-from src.modules.protein.protein import ProteinProps
-from src.modules.protein.protein_list import ProteinProp
+import numpy as np
+
+from src.modules.protein.protein import ProteinProp, ProteinProps
 
 TrainRecorderResultKey = Literal["train", "evaluate", "validate"]
+train_recorder_result_keys: list[TrainRecorderResultKey] = ["train", "validate", "evaluate"]
+
+CriteriaName = Literal["root_mean_squared_error", "mean_squared_error", "mean_absolute_error", "pearsonr"]
+criteria_names: list[CriteriaName] = [
+    "root_mean_squared_error",
+    "mean_squared_error",
+    "mean_absolute_error",
+    "pearsonr",
+]
 
 
 class Criteria(TypedDict):
@@ -13,6 +23,13 @@ class Criteria(TypedDict):
     pearsonr: float
 
 
+class EpochPrediction(TypedDict):
+    # (samples, output props) arrays of one epoch, and the criteria of each output prop
+    output: np.ndarray
+    label: np.ndarray
+    criteria: list[Criteria]
+
+
 class EpochResult(TypedDict):
     prop_name: ProteinProp
     epoch: int
@@ -1,15 +1,18 @@
-import matplotlib.pyplot as plt
-import polars as pl
-from matplotlib.axes import Axes
+from typing import TYPE_CHECKING
 
 from src.modules.color.ColorPallet import ColorPallet
-from src.modules.protein.protein_list import ProteinProp
+from src.modules.protein.protein import ProteinProp
 from src.modules.train.types import TrainRecorderResultKey, TrainResult
 
+if TYPE_CHECKING:
+    from matplotlib.axes import Axes
+
 
 class Visualizer:
     @classmethod
     def save_histogram(cls, path: str, prop_name: ProteinProp):
+        import polars as pl
+
         df = pl.read_csv(path)
         df = df.filter(pl.col("ccs").is_null())
         # plt.hist(values, bins=50, color=ColorPallet.hex_universal_color["blue"])
@@ -28,6 +31,8 @@ class Visualizer:
         self._pallet = ColorPallet()
 
     def save_learning_result(self, path: str, prop_name: ProteinProp):
+        import matplotlib.pyplot as plt
+
         figure = plt.figure(dpi=100, figsize=(18, 12))
         figure.subplots_adjust(left=0.1, right=0.75, bottom=0.2, top=0.85)
         left_axes = figure.add_subplot(1, 1, 1)
@@ -54,7 +59,7 @@ class Visualizer:
         plt.savefig(path)
         plt.close()
 
-    def _render_loss_curve(self, key: TrainRecorderResultKey, axes: Axes, prop_name: ProteinProp):
+    def _render_loss_curve(self, key: TrainRecorderResultKey, axes: "Axes", prop_name: ProteinProp):
         results = self._train_result["train_result"][key][prop_name]
 
         epochs = [result["epoch"] for result in results]
@@ -63,7 +68,7 @@ class Visualizer:
         color = self._pallet.consume_current_color()
         axes.plot(epochs, root_mean_squared_errors, color=color, label=f"{key} Loss")
 
-    def _render_pearsonr_curve(self, key: TrainRecorderResultKey, axes: Axes, prop_name: ProteinProp):
+    def _render_pearsonr_curve(self, key: TrainRecorderResultKey, axes: "Axes", prop_name: ProteinProp):
         results = self._train_result["train_result"][key][prop_name]
 
         epochs = [result["epoch"] for result in results]
@@ -72,7 +77,7 @@ class Visualizer:
         color = self._pallet.consume_current_color()
         axes.plot(epochs, pearsonrs, color=color, label=f"{key} Pearson")
 
-    def _render_evaluate_max_accuracy_pearsonr(self, axes: Axes, prop_name: ProteinProp):
+    def _render_evaluate_max_accuracy_pearsonr(self, axes: "Axes", prop_name: ProteinProp):
         result = self._train_result["max_accuracy_result"]["evaluate"][prop_name]
 
         pearsonr = result["criteria"]["pearsonr"]
@@ -83,6 +88,8 @@ class Visualizer:
         axes.axvline(x=epoch, ymin=0, ymax=1, color=color, linestyle="--")
 
     def save_evaluate_max_accuracy_scatter(self, path: str, prop_name: ProteinProp):
+        import matplotlib.pyplot as plt
+
         figure = plt.figure(dpi=100, figsize=(8, 6))
         # figure.subplots_adjust(left=0.1, right=0.75, bottom=0.2, top=0.85)
         axes = figure.add_subplot(1, 1, 1)